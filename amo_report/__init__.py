@@ -1,6 +1,4 @@
-from .config import load_config
-from .report import compute_report_by_tags
-from .utils import parse_tags
+from importlib import import_module
 
 __all__ = [
     "load_config",
@@ -8,4 +6,23 @@ __all__ = [
     "parse_tags",
 ]
 
+# Re-exports resolve on first access, so importing a light submodule
+# (metrics, jobs, config) does not pull in pandas/numpy.
+_EXPORTS = {
+    "load_config": ".config",
+    "compute_report_by_tags": ".report",
+    "parse_tags": ".utils",
+}
 
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
 from pathlib import Path
+import hashlib
+import json
+
 import yaml
 
 
@@ -9,3 +12,7 @@ def load_config(path: str | Path) -> dict:
         return yaml.safe_load(f)
 
 
+def config_fingerprint(cfg: dict) -> str:
+    """Stable short hash of a loaded config, for cache keys."""
+    payload = json.dumps(cfg, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
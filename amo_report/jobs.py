@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+import hashlib
+import threading
+import time
+import uuid
+
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+def job_key(*parts: Any) -> str:
+    """Stable key for deduplicating identical jobs across sessions."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(repr(p).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+@dataclass
+class Job:
+    id: str
+    key: str
+    label: str
+    total: int
+    status: str = PENDING
+    done: int = 0
+    results: List[Any] = field(default_factory=list)
+    error: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    nbytes: int = 0  # approximate size of `results` (when the scheduler has a sizeof)
+    subscribers: Set[str] = field(default_factory=set, repr=False)
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def progress(self) -> float:
+        if self.total <= 0:
+            return 1.0 if self.finished else 0.0
+        return min(self.done / self.total, 1.0)
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def step(self) -> None:
+        """Count a unit of work that produces no result item (e.g. a shared aggregation)."""
+        self.done += 1
+
+
+class JobScheduler:
+    """Small in-process scheduler for long report/export work.
+
+    A job is a generator function taking the Job; every yielded item is
+    appended to ``job.results`` as soon as it is produced, so the page can
+    render partial output while the rest is still running. Cancellation is
+    checked between items. Submitting a job whose key matches a pending,
+    running or (with ``reuse_finished``) completed job returns the existing
+    one instead; side-effecting jobs such as exports pass
+    ``reuse_finished=False`` so a repeated click runs them again.
+
+    Sessions attached to a shared job are tracked as ``subscribers``: a
+    session's cancel only detaches it, and the job is cancelled once nobody
+    is left waiting for it.
+    """
+
+    def __init__(self, max_workers: int = 2, keep_finished: int = 50, sizeof: Callable[[Any], int] | None = None):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="amo-job")
+        self._sizeof = sizeof
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, str] = {}
+        self._keep_finished = keep_finished
+
+    def submit(
+        self,
+        key: str,
+        fn: Callable[[Job], Iterator[Any]],
+        total: int,
+        label: str = "",
+        subscriber: str | None = None,
+        reuse_finished: bool = True,
+    ) -> Job:
+        with self._lock:
+            existing_id = self._by_key.get(key)
+            existing = self._jobs.get(existing_id) if existing_id else None
+            # Reuse anything still in flight (and, unless disabled, finished successfully);
+            # rerun failed/cancelled
+            reusable = (PENDING, RUNNING, DONE) if reuse_finished else (PENDING, RUNNING)
+            if existing is not None and existing.status in reusable and not existing.cancel_requested:
+                if subscriber is not None:
+                    existing.subscribers.add(subscriber)
+                return existing
+            job = Job(id=uuid.uuid4().hex[:12], key=key, label=label, total=total)
+            if subscriber is not None:
+                job.subscribers.add(subscriber)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+            self._prune()
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id: str | None) -> Job | None:
+        if not job_id:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def results_nbytes(self) -> int:
+        """Approximate memory held by the results of all retained jobs."""
+        with self._lock:
+            return sum(j.nbytes for j in self._jobs.values())
+
+    def cancel(self, job_id: str | None, subscriber: str | None = None) -> None:
+        """Detach `subscriber`; the job itself stops when no subscriber is left."""
+        job = self.get(job_id)
+        if job is None:
+            return
+        with self._lock:
+            job.subscribers.discard(subscriber)
+            if job.subscribers:
+                return
+        job.cancel()
+
+    def _run(self, job: Job, fn: Callable[[Job], Iterator[Any]]) -> None:
+        if job.cancel_requested:
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            for item in fn(job):
+                job.results.append(item)
+                job.done += 1
+                if self._sizeof is not None:
+                    job.nbytes += self._sizeof(item)
+                if job.cancel_requested:
+                    break
+            # A job may also honour a cancel by returning early, so check after the loop
+            job.status = CANCELLED if job.cancel_requested else DONE
+        except Exception as ex:
+            job.error = str(ex)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self) -> None:
+        finished = [j for j in self._jobs.values() if j.finished]
+        if len(finished) <= self._keep_finished:
+            return
+        finished.sort(key=lambda j: j.finished_at or 0.0)
+        for j in finished[: len(finished) - self._keep_finished]:
+            self._jobs.pop(j.id, None)
+            if self._by_key.get(j.key) == j.id:
+                self._by_key.pop(j.key, None)
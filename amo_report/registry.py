@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict
+import dataclasses
+import hashlib
+import sys
+import threading
+
+import pandas as pd
+
+from .config import config_fingerprint
+from .metrics import DATASET_LOAD_SECONDS, DATASET_REQUESTS
+from .tag_index import TagIndex, build_tag_index
+
+
+def content_key(file_bytes: bytes) -> str:
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def approx_nbytes(obj: Any) -> int:
+    """Rough deep size of report results: frames, containers, dataclasses and scalars."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(approx_nbytes(k) + approx_nbytes(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(approx_nbytes(x) for x in obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return sys.getsizeof(obj) + sum(approx_nbytes(getattr(obj, f.name)) for f in dataclasses.fields(obj))
+    return sys.getsizeof(obj)
+
+
+def freeze_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a copy of `df` backed by read-only NumPy arrays (one block per column).
+
+    Any in-place write raises ``ValueError``; derived frames (filters, copies)
+    are unaffected, so sessions can share the result safely.
+    """
+    cols = {}
+    for c in df.columns:
+        s = df[c]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            codes = s.cat.codes.to_numpy(copy=True)
+            codes.flags.writeable = False
+            cols[c] = pd.Categorical.from_codes(codes, dtype=s.dtype)
+        else:
+            arr = s.to_numpy(copy=True)
+            arr.flags.writeable = False
+            cols[c] = arr
+    return pd.DataFrame(cols, index=df.index, copy=False)
+
+
+@dataclass(frozen=True)
+class Dataset:
+    key: str
+    name: str
+    df: pd.DataFrame
+    nbytes: int
+    tag_index: TagIndex | None = None
+
+
+@dataclass(frozen=True, eq=False)
+class DatasetHandle:
+    """Cheap cache key for a Dataset together with the config it is reported with.
+
+    Equality and hashing go through `token` (content hash + config
+    fingerprint), so caches never touch the frame's cells. For st.cache_data
+    pass ``hash_funcs={DatasetHandle: lambda h: h.token}``.
+    """
+
+    dataset: Dataset
+    cfg: dict
+    cfg_key: str
+
+    @classmethod
+    def of(cls, dataset: Dataset, cfg: dict) -> "DatasetHandle":
+        return cls(dataset=dataset, cfg=cfg, cfg_key=config_fingerprint(cfg))
+
+    @property
+    def token(self) -> tuple[str, str]:
+        return (self.dataset.key, self.cfg_key)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, DatasetHandle) and self.token == other.token
+
+    def __hash__(self) -> int:
+        return hash(self.token)
+
+
+class DatasetRegistry:
+    """Process-wide store of prepared uploads keyed by content hash.
+
+    Every session uploading the same bytes gets the same immutable Dataset.
+    When the total size exceeds `budget_bytes` the least recently used
+    datasets are evicted (the one just requested is always kept).
+
+    Other process-wide holders of report data (the tag row cache, retained
+    job results) can be registered with `track`; their size counts against
+    the same budget, though only datasets are evicted. Frames still referenced
+    by sessions or st.cache_data after eviction are not counted.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = int(budget_bytes)
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, Dataset]" = OrderedDict()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._tracked: Dict[str, Callable[[], int]] = {}
+
+    def track(self, name: str, nbytes: Callable[[], int]) -> None:
+        """Count `nbytes()` of another in-memory store in `usage` and the budget."""
+        with self._lock:
+            self._tracked[name] = nbytes
+
+    def get(self, key: str) -> Dataset | None:
+        with self._lock:
+            ds = self._items.get(key)
+            if ds is not None:
+                self._items.move_to_end(key)
+            return ds
+
+    def get_or_load(self, file_bytes: bytes, name: str, loader: Callable[[bytes, str], pd.DataFrame]) -> Dataset:
+        key = content_key(file_bytes)
+        ds = self.get(key)
+        if ds is not None:
+            DATASET_REQUESTS.inc(result="hit")
+            return ds
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        # Per-key lock: concurrent sessions uploading the same file parse it once
+        with key_lock:
+            ds = self.get(key)
+            if ds is not None:
+                DATASET_REQUESTS.inc(result="hit")
+                return ds
+            DATASET_REQUESTS.inc(result="miss")
+            with DATASET_LOAD_SECONDS.time():
+                loaded = loader(file_bytes, name)
+            # Measure before freezing: pandas' deep size walk needs writable buffers
+            nbytes = int(loaded.memory_usage(deep=True).sum())
+            tag_index = build_tag_index(loaded["Теги сделки"], dataset_key=key) if "Теги сделки" in loaded.columns else None
+            if tag_index is not None:
+                nbytes += tag_index.nbytes
+            ds = Dataset(key=key, name=name, df=freeze_frame(loaded), nbytes=nbytes, tag_index=tag_index)
+            with self._lock:
+                self._items[key] = ds
+                self._loading.pop(key, None)
+                self._evict(keep=key)
+        return ds
+
+    def usage(self) -> dict:
+        with self._lock:
+            datasets_bytes = sum(d.nbytes for d in self._items.values())
+            tracked = {name: int(fn()) for name, fn in self._tracked.items()}
+            return {
+                "datasets": len(self._items),
+                "datasets_bytes": datasets_bytes,
+                "tracked_bytes": tracked,
+                "used_bytes": datasets_bytes + sum(tracked.values()),
+                "budget_bytes": self.budget_bytes,
+            }
+
+    def _evict(self, keep: str) -> None:
+        used = sum(d.nbytes for d in self._items.values()) + sum(int(fn()) for fn in self._tracked.values())
+        for key in list(self._items.keys()):
+            if used <= self.budget_bytes:
+                break
+            if key == keep:
+                continue
+            used -= self._items.pop(key).nbytes
@@ -1,19 +1,23 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from datetime import date
-from typing import List
+from typing import Callable, Iterator, List
 
+import numpy as np
 import pandas as pd
 
+from .config import config_fingerprint
+from .metrics import GROUP_REPORTS_SECONDS, REPORT_SECONDS, timed
+from .row_cache import TagRowCache
+from .tag_groups import CompiledGroups
+from .tag_index import TagIndex, build_tag_index, eval_tag_query
 from .utils import (
     normalize_series,
     only_date,
     last_wednesday_on_or_before,
     mask_stage_in,
-    sum_budget,
-    explode_by_tags,
     budget_to_float,
-    collect_unique_norm_tags,
     mask_no_wazzap,
 )
 
@@ -28,6 +32,27 @@ REQUIRED_COLS = [
 ]
 
 
+PREPARED_COLS = ["__stage", "__funnel", "__date", "__budget_float"]
+
+
+def prepare_dataset(df_in: pd.DataFrame) -> pd.DataFrame:
+    """Copy of `df_in` with the normalized helper columns used by the report.
+
+    Columns whose source is missing are skipped, so unusual uploads can still be
+    stored and inspected; `compute_report_by_tags` reports the missing columns.
+    """
+    df = df_in.copy()
+    if "Этап сделки" in df.columns:
+        df["__stage"] = pd.Categorical(normalize_series(df["Этап сделки"]))  # used in masks
+    if "Воронка" in df.columns:
+        df["__funnel"] = pd.Categorical(normalize_series(df["Воронка"]))  # used for filtering
+    if "Дата создания" in df.columns:
+        df["__date"] = only_date(df["Дата создания"])  # used for date filter
+    if "Бюджет" in df.columns:
+        df["__budget_float"] = budget_to_float(df["Бюджет"])  # used for the revenue sum
+    return df
+
+
 def _pick(cfg: dict, segment: str, key: str) -> List[str]:
     node = cfg["stages"][key]
     if "ALL" in node:
@@ -35,61 +60,96 @@ def _pick(cfg: dict, segment: str, key: str) -> List[str]:
     return node.get(segment, [])
 
 
-def _calc_block(df: pd.DataFrame, cfg: dict, segment: str, mode: str) -> dict:
-    total_in_period = len(df)
-
-    already_bought = _pick(cfg, segment, "already_bought")
-    closed_not_impl = _pick(cfg, segment, "closed_not_impl")
-    lead_not_distributed = _pick(cfg, segment, "lead_not_distributed")
+def _stage_groups(cfg: dict, segment: str, mode: str) -> dict[str, List[str]]:
+    """Stage lists behind each metric for the given segment and mode."""
     # Contact group may differ by mode; use contact_group_auto for auto if provided
     if mode == "auto" and "contact_group_auto" in cfg.get("stages", {}):
         contact_group = _pick(cfg, segment, "contact_group_auto")
     else:
         contact_group = _pick(cfg, segment, "contact_group")
-    reply_group = _pick(cfg, segment, "reply_group")
     # Revenue counts only stages that imply payment (e.g., prepayment or fully implemented)
     revenue_group = _pick(cfg, segment, "revenue_group") if "revenue_group" in cfg.get("stages", {}) else []
-    no_wazzap = _pick(cfg, segment, "no_wazzap")
+    if not revenue_group:
+        # Fallback: include common payment-like stages
+        revenue_group = [
+            "аванс",
+            "успешно реализовано",
+            "prepayment",
+            "successfully and implemented",
+        ]
+    return {
+        "already": _pick(cfg, segment, "already_bought"),
+        "closed": _pick(cfg, segment, "closed_not_impl"),
+        "lead_nd": _pick(cfg, segment, "lead_not_distributed"),
+        "contact": contact_group,
+        "reply": _pick(cfg, segment, "reply_group"),
+        "revenue": revenue_group,
+        "nowz": _pick(cfg, segment, "no_wazzap"),
+    }
+
+
+def _block_masks(df: pd.DataFrame, cfg: dict, segment: str, mode: str) -> dict:
+    """Per-row stage masks and budget for `df`, computed once and sliced per tag."""
+    groups = _stage_groups(cfg, segment, mode)
+    masks = {k: mask_stage_in(df, v).to_numpy() for k, v in groups.items() if k != "nowz"}
+    masks["nowz"] = mask_no_wazzap(df, groups["nowz"]).to_numpy()
+    if "__budget_float" in df.columns:
+        masks["budget"] = df["__budget_float"].to_numpy(dtype=float)
+    else:
+        masks["budget"] = budget_to_float(df["Бюджет"]).to_numpy(dtype=float)
+    return masks
 
-    m_already = mask_stage_in(df, already_bought)
-    m_closed = mask_stage_in(df, closed_not_impl)
-    m_lead_nd = mask_stage_in(df, lead_not_distributed)
-    m_contact = mask_stage_in(df, contact_group)
-    m_reply = mask_stage_in(df, reply_group)
-    m_nowz = mask_no_wazzap(df, no_wazzap)
 
+def _block_metrics(masks: dict, mode: str, rows: np.ndarray | None = None) -> dict:
+    """Report metrics over `rows` (positions into the masked frame; all rows if None)."""
+    if rows is None:
+        total_in_period = len(masks["reply"])
+        m = masks
+    else:
+        total_in_period = len(rows)
+        m = {k: v[rows] for k, v in masks.items()}
+    return _metrics_from_counts(
+        mode,
+        total_in_period,
+        n_already=int(m["already"].sum()),
+        n_closed=int(m["closed"].sum()),
+        n_lead_nd=int(m["lead_nd"].sum()),
+        n_nowz=int(m["nowz"].sum()),
+        contact=int(m["contact"].sum()),
+        reply=int(m["reply"].sum()),
+        budget=float(np.nansum(m["budget"][m["revenue"]])),
+    )
+
+
+def _metrics_from_counts(
+    mode: str,
+    total_in_period: int,
+    n_already: int,
+    n_closed: int,
+    n_lead_nd: int,
+    n_nowz: int,
+    contact: int,
+    reply: int,
+    budget: float,
+) -> dict:
     if mode == "basket":
-        cnt_wo_already = total_in_period - int(m_closed.sum()) - int(m_already.sum())
-        processed = cnt_wo_already - int(m_lead_nd.sum())
+        cnt_wo_already = total_in_period - n_closed - n_already
+        processed = cnt_wo_already - n_lead_nd
         base_denom = max(cnt_wo_already, 1)
     elif mode == "auto":
-        cnt = total_in_period - int(m_nowz.sum())
+        cnt = total_in_period - n_nowz
         processed = cnt
         cnt_wo_already = cnt
         base_denom = max(cnt, 1)
     elif mode == "manager":
-        cnt = total_in_period - int(m_closed.sum())
-        processed = cnt - int(m_lead_nd.sum())
+        cnt = total_in_period - n_closed
+        processed = cnt - n_lead_nd
         cnt_wo_already = cnt
         base_denom = max(cnt, 1)
     else:
         raise ValueError("mode должен быть 'basket' | 'auto' | 'manager'")
 
-    contact = int(m_contact.sum())
     ignore = max(processed - contact, 0)
-    reply = int(m_reply.sum())
-    if revenue_group:
-        m_revenue = mask_stage_in(df, revenue_group)
-        budget = sum_budget(df[m_revenue])
-    else:
-        # Fallback: include common payment-like stages
-        m_revenue = mask_stage_in(df, [
-            "аванс",
-            "успешно реализовано",
-            "prepayment",
-            "successfully and implemented",
-        ])
-        budget = sum_budget(df[m_revenue])
 
     def pct(a, b):
         return round((a / b) * 100, 2) if b > 0 else 0.0
@@ -110,146 +170,343 @@ def _calc_block(df: pd.DataFrame, cfg: dict, segment: str, mode: str) -> dict:
     return tbl
 
 
-def compute_report_by_tags(
-    df_in: pd.DataFrame,
-    cfg: dict,
-    segment: str,
-    funnel: str,
-    mode: str,  # "basket" | "auto" | "manager"
-    date_from: date | None,
-    date_to: date | None,
-    tags: list[str],  # list of tags to include (display order)
-    tag_desc_by_norm: dict[str, str] | None = None,  # optional: excel group descriptions
-) -> dict:
-    df = df_in.copy()
-    missing = [c for c in REQUIRED_COLS if c not in df.columns]
-    if missing:
-        raise ValueError(f"Не найдены колонки: {missing}")
+def _calc_block(df: pd.DataFrame, cfg: dict, segment: str, mode: str) -> dict:
+    return _block_metrics(_block_masks(df, cfg, segment, mode), mode)
 
-    # Precompute normalized columns once for performance
-    df["__stage"] = pd.Categorical(normalize_series(df["Этап сделки"]))  # used in masks
-    df["__funnel"] = pd.Categorical(normalize_series(df["Воронка"]))  # used for filtering
-    df["__date"] = only_date(df["Дата создания"])  # used for date filter
-    df["__budget_float"] = budget_to_float(df["Бюджет"])  # used for sum_budget
 
-    df = df[df["__funnel"] == funnel.strip().lower()]
-    if mode == "basket" and date_from is not None and date_to is not None:
-        df = df[(df["__date"] >= date_from) & (df["__date"] <= date_to)]
+def _contact_records(contacts: pd.DataFrame) -> list[dict]:
+    cont_df = (
+        contacts
+        .dropna(subset=["Основной контакт"])  # require contact
+        .assign(**{"Основной контакт": lambda x: x["Основной контакт"].astype(str).str.strip()})
+    )
+    cont_df = cont_df.replace({"Основной контакт": {"": pd.NA}}).dropna(subset=["Основной контакт"]).drop_duplicates()
+    return cont_df.to_dict("records")
 
-    # Build header early so special cases can return
+
+PERCENT_COLS = ["% обработано", "% контакт", "% игнор", "CR, %", "Конверсия в покупку, %"]
+
+
+def _format_percents(table_df: pd.DataFrame) -> pd.DataFrame:
+    # Format percentage columns: round to whole numbers and add '%'
+    for col in PERCENT_COLS:
+        if col in table_df.columns:
+            def _fmt_pct(v):
+                if pd.isna(v):
+                    return ""
+                try:
+                    s = f"{float(v):.0f}"
+                    return f"{s}%"
+                except Exception:
+                    return f"{v}%"
+            table_df[col] = table_df[col].apply(_fmt_pct)
+    return table_df
+
+
+@dataclass
+class TagRow:
+    """One report row (a tag or a tag query) with its reply contacts."""
+
+    key: str  # normalized tag or query text; used for descriptions
+    display: str  # spelling shown in the table
+    metrics: dict
+    contacts_key: str  # spelling the contact list is keyed by
+    contacts: list[dict]
+
+
+def _report_header(mode: str, date_from: date | None, date_to: date | None) -> dict:
     if mode == "basket" and date_from and date_to:
         op_date = last_wednesday_on_or_before(date_to)
         from datetime import date as _date
-        header = {
+        return {
             "Название": "Брошенная корзина",
             "Период": f"с {date_from.strftime('%d %B')} по {date_to.strftime('%d %B')}",
             "Отданы в ОП": op_date.strftime("%d.%b").replace(".", "."),
             "Дней от начала": (_date.today() - op_date).days,
         }
-    else:
-        header = {
-            "Название": "Автосообщение" if mode == "auto" else "Через менеджера",
-            "Период": "по выбранным тегам (без фильтра по дате)",
-            "Отданы в ОП": "",
-            "Дней от начала": "",
-        }
+    return {
+        "Название": "Автосообщение" if mode == "auto" else "Через менеджера",
+        "Период": "по выбранным тегам (без фильтра по дате)",
+        "Отданы в ОП": "",
+        "Дней от начала": "",
+    }
+
+
+def _select_rows(
+    df_in: pd.DataFrame, funnel: str, mode: str, date_from: date | None, date_to: date | None
+) -> tuple[pd.DataFrame, np.ndarray]:
+    """Prepared frame plus the funnel/date selection as a mask over all its rows."""
+    # Reuse normalized columns when the caller passes an already prepared dataset
+    df = df_in if all(c in df_in.columns for c in PREPARED_COLS) else prepare_dataset(df_in)
+    sel = (df["__funnel"] == funnel.strip().lower()).to_numpy()
+    if mode == "basket" and date_from is not None and date_to is not None:
+        sel &= ((df["__date"] >= date_from) & (df["__date"] <= date_to)).to_numpy()
+    return df, sel
+
+
+def _tag_rows(
+    df_in: pd.DataFrame,
+    cfg: dict,
+    segment: str,
+    funnel: str,
+    mode: str,
+    date_from: date | None,
+    date_to: date | None,
+    chosen_norm: list[str],
+    queries: list[str],
+    tag_index: TagIndex | None = None,
+) -> tuple[list[TagRow] | None, bool]:
+    """Pandas backend: rows for the chosen tags and queries, plus the auto-order flag.
+
+    Returns ``None`` rows when nothing can be sliced in basket mode, where the
+    report falls back to a single "all deals" row.
+    """
+    df, sel = _select_rows(df_in, funnel, mode, date_from, date_to)
+    if tag_index is None or tag_index.n_rows != len(df):
+        tag_index = build_tag_index(df["Теги сделки"])
 
-    chosen = [t for t in tags if str(t).strip()]
-    chosen_norm = [str(t).strip().lower() for t in chosen]
     auto_tags_order = False
-    if not chosen_norm:
-        chosen_norm = collect_unique_norm_tags(df)
+    if not chosen_norm and not queries:
+        chosen_norm = tag_index.ordered_tags(within=sel)
         auto_tags_order = True
+        if not chosen_norm and mode == "basket":
+            return None, auto_tags_order
 
-    include_set = set(chosen_norm) if chosen_norm else None
-    # Special case: for basket with no tags selected, compute overall aggregate without tag slicing
-    if mode == "basket" and not chosen_norm:
-        metrics = _calc_block(df, cfg, segment, mode)
-        table_df = pd.DataFrame([{"Тег сделки": "Все сделки", **metrics}])
-        # Format percentage columns consistently
-        percent_cols = ["% обработано", "% контакт", "% игнор", "CR, %", "Конверсия в покупку, %"]
-        for col in percent_cols:
-            if col in table_df.columns:
-                def _fmt_pct(v):
-                    if pd.isna(v):
-                        return ""
-                    try:
-                        s = f"{float(v):.0f}"
-                        return f"{s}%"
-                    except Exception:
-                        return f"{v}%"
-                table_df[col] = table_df[col].apply(_fmt_pct)
-
-        # Prepare reply contacts aggregated, include ID if available
-        reply_group = _pick(cfg, segment, "reply_group")
-        if "__stage" in df.columns:
-            reply_mask_all = df["__stage"].isin([x.lower() for x in reply_group])
-        else:
-            reply_mask_all = normalize_series(df["Этап сделки"]).isin([x.lower() for x in reply_group])
-        cols = ["Основной контакт"] + (["ID"] if "ID" in df.columns else [])
-        cont_df = (
-            df.loc[reply_mask_all, cols]
-            .dropna(subset=["Основной контакт"])  # require contact
-            .assign(**{"Основной контакт": lambda x: x["Основной контакт"].astype(str).str.strip()})
-        )
-        cont_df = cont_df.replace({"Основной контакт": {"": pd.NA}}).dropna(subset=["Основной контакт"]).drop_duplicates()
-        reply_contacts_by_tag = {"Все сделки": cont_df.to_dict("records")}
-        return {"header": header, "table_df": table_df, "reply_contacts_by_tag": reply_contacts_by_tag}
-
-    dfe = explode_by_tags(df, include_norm_tags=include_set)
-
-    rows = []
+    # Stage masks are computed once over the full frame; each tag only slices them
+    masks = _block_masks(df, cfg, segment, mode)
+    reply_mask = masks["reply"]
+    sel_reply = sel & reply_mask
+    contacts = df[["Основной контакт"] + (["ID"] if "ID" in df.columns else [])]
+
+    def _row(key: str, display: str, contacts_key: str, r: np.ndarray) -> TagRow:
+        rr = r[reply_mask[r]]
+        return TagRow(key, display, _block_metrics(masks, mode, r), contacts_key, _contact_records(contacts.iloc[rr]))
+
+    out: list[TagRow] = []
     for tag_norm in chosen_norm:
-        sub = dfe[dfe["__tag_norm"] == tag_norm]
-        tag_display = sub["__tag_display"].iloc[0] if not sub.empty else tag_norm
-        if tag_desc_by_norm:
-            desc = tag_desc_by_norm.get(tag_norm, "")
-        else:
-            desc = ""
-        metrics = _calc_block(sub, cfg, segment, mode)
-        row = {"Тег сделки": tag_display, "Описание": desc, **metrics}
-        rows.append(row)
-
-    # header already built above
-
-    table_df = pd.DataFrame(rows)
+        r = tag_index.rows_of(tag_norm)
+        # Contact lists are keyed by the spelling of the first replying deal
+        out.append(_row(
+            tag_norm,
+            tag_index.display_of(tag_norm, within=sel),
+            tag_index.display_of(tag_norm, within=sel_reply),
+            r[sel[r]],
+        ))
+    for q in queries:
+        out.append(_row(q, q, q, np.flatnonzero(eval_tag_query(tag_index, q) & sel)))
+    return out, auto_tags_order
+
+
+def _all_deals_report(
+    df_in: pd.DataFrame, cfg: dict, segment: str, funnel: str, mode: str, date_from: date | None, date_to: date | None
+) -> dict:
+    """Overall aggregate without tag slicing (basket mode with no tags at all)."""
+    df, sel = _select_rows(df_in, funnel, mode, date_from, date_to)
+    df = df[sel]
+    metrics = _calc_block(df, cfg, segment, mode)
+    table_df = _format_percents(pd.DataFrame([{"Тег сделки": "Все сделки", **metrics}]))
+
+    # Prepare reply contacts aggregated, include ID if available
+    reply_group = _pick(cfg, segment, "reply_group")
+    reply_mask_all = mask_stage_in(df, reply_group)
+    cols = ["Основной контакт"] + (["ID"] if "ID" in df.columns else [])
+    reply_contacts_by_tag = {"Все сделки": _contact_records(df.loc[reply_mask_all, cols])}
+    return {"table_df": table_df, "reply_contacts_by_tag": reply_contacts_by_tag}
+
+
+def assemble_report(rows: list[TagRow], auto_tags_order: bool, tag_desc_by_norm: dict[str, str] | None = None) -> dict:
+    """Build the report table and contact lists from tag rows (in display order)."""
+    table_df = pd.DataFrame([
+        {
+            "Тег сделки": r.display,
+            "Описание": tag_desc_by_norm.get(r.key, "") if tag_desc_by_norm else "",
+            **r.metrics,
+        }
+        for r in rows
+    ])
     # Keep explicit tag order (from file/selection). Only sort when tags were auto-detected.
     if auto_tags_order and not table_df.empty and "Кол-во" in table_df.columns:
         table_df = table_df.sort_values("Кол-во", ascending=False).reset_index(drop=True)
+    table_df = _format_percents(table_df)
 
-    # Format percentage columns: round to 2 decimals, trim trailing zeros, add '%'
-    percent_cols = ["% обработано", "% контакт", "% игнор", "CR, %", "Конверсия в покупку, %"]
-    for col in percent_cols:
-        if col in table_df.columns:
-            def _fmt_pct(v):
-                if pd.isna(v):
-                    return ""
-                try:
-                    s = f"{float(v):.0f}"
-                    return f"{s}%"
-                except Exception:
-                    return f"{v}%"
-            table_df[col] = table_df[col].apply(_fmt_pct)
-
-    reply_group = _pick(cfg, segment, "reply_group")
-    # use precomputed normalized stage when available
-    if "__stage" in dfe.columns:
-        reply_mask = dfe["__stage"].isin([x.lower() for x in reply_group])
-    else:
-        reply_mask = normalize_series(dfe["Этап сделки"]).isin([x.lower() for x in reply_group])
     reply_contacts_by_tag: dict[str, list[dict]] = {}
-    for tag_norm in chosen_norm:
-        sub = dfe[(dfe["__tag_norm"] == tag_norm) & reply_mask]
-        cols = ["Основной контакт"] + (["ID"] if "ID" in sub.columns else [])
-        cont_df = (
-            sub[cols]
-            .dropna(subset=["Основной контакт"])  # require contact
-            .assign(**{"Основной контакт": lambda x: x["Основной контакт"].astype(str).str.strip()})
-        )
-        cont_df = cont_df.replace({"Основной контакт": {"": pd.NA}}).dropna(subset=["Основной контакт"]).drop_duplicates()
-        disp = sub["__tag_display"].iloc[0] if not sub.empty else tag_norm
-        reply_contacts_by_tag[disp] = cont_df.to_dict("records")
+    for r in rows:
+        reply_contacts_by_tag[r.contacts_key] = r.contacts
+    return {"table_df": table_df, "reply_contacts_by_tag": reply_contacts_by_tag}
+
+
+def contacts_frame(reply_contacts_by_tag: dict[str, list]) -> pd.DataFrame:
+    """All reply contacts as one long frame: Тег, Основной контакт[, ID].
+
+    Built column-wise from the records, without a DataFrame per tag.
+    """
+    tags, names, ids = [], [], []
+    has_id = False
+    for tag, contacts in reply_contacts_by_tag.items():
+        for c in contacts:
+            tags.append(tag)
+            if isinstance(c, dict):
+                names.append(c.get("Основной контакт"))
+                has_id = has_id or "ID" in c
+                ids.append(c.get("ID"))
+            else:
+                names.append(c)
+                ids.append(None)
+    cols = {"Тег": tags, "Основной контакт": names}
+    if has_id:
+        cols["ID"] = ids
+    return pd.DataFrame(cols, columns=list(cols))
+
+
+def _polars_backend(cfg: dict):
+    """The polars backend module when selected in config and installed, else None."""
+    if str(cfg.get("compute", {}).get("backend", "pandas")).strip().lower() != "polars":
+        return None
+    try:
+        from . import report_polars
+    except ImportError:
+        return None
+    return report_polars
+
+
+def _memo_tag_rows(
+    cache: TagRowCache,
+    scope: tuple,
+    compute,
+    mode: str,
+    chosen_norm: list[str],
+    queries: list[str],
+) -> tuple[list[TagRow] | None, bool]:
+    """`_tag_rows` through `cache`: only rows missing in `scope` are computed."""
+    auto_tags_order = not chosen_norm and not queries
+    if auto_tags_order:
+        # The auto-detected tag order is cached as well, so the full pass runs once
+        order = cache.get(scope, ("order",))
+        if order is None:
+            rows, _ = compute([], [])
+            cache.put_many(scope, {("order",): tuple(r.key for r in rows or [])})
+            cache.put_many(scope, {("tag", r.key): r for r in rows or []})
+            return rows, auto_tags_order
+        if not order and mode == "basket":
+            return None, auto_tags_order
+        chosen_norm = list(order)
+
+    keys = [("tag", t) for t in chosen_norm] + [("query", q) for q in queries]
+    found = cache.get_many(scope, keys)
+    missing_tags = [k[1] for k in dict.fromkeys(keys) if k[0] == "tag" and k not in found]
+    missing_queries = [k[1] for k in dict.fromkeys(keys) if k[0] == "query" and k not in found]
+    if missing_tags or missing_queries:
+        rows, _ = compute(missing_tags, missing_queries)
+        fresh = dict(zip([("tag", t) for t in missing_tags] + [("query", q) for q in missing_queries], rows))
+        cache.put_many(scope, fresh)
+        found.update(fresh)
+    return [found[k] for k in keys], auto_tags_order
+
+
+@timed(REPORT_SECONDS)
+def compute_report_by_tags(
+    df_in: pd.DataFrame,
+    cfg: dict,
+    segment: str,
+    funnel: str,
+    mode: str,  # "basket" | "auto" | "manager"
+    date_from: date | None,
+    date_to: date | None,
+    tags: list[str],  # list of tags to include (display order)
+    tag_desc_by_norm: dict[str, str] | None = None,  # optional: excel group descriptions
+    tag_queries: list[str] | None = None,  # optional: boolean segments, e.g. "paid AND NOT fail"
+    tag_index: TagIndex | None = None,  # optional: prebuilt incidence, used only if its dataset_key matches
+    row_cache: TagRowCache | None = None,  # optional: memoize rows across calls...
+    dataset_key: str | None = None,  # ...for this dataset (e.g. registry content hash)
+) -> dict:
+    # Build header early so special cases can return
+    header = _report_header(mode, date_from, date_to)
+    rows, auto_tags_order = _report_rows(
+        df_in, cfg, segment, funnel, mode, date_from, date_to, tags, tag_queries, tag_index, row_cache, dataset_key
+    )
+
+    # Special case: for basket with no tags selected, compute overall aggregate without tag slicing
+    if rows is None:
+        return {"header": header, **_all_deals_report(df_in, cfg, segment, funnel, mode, date_from, date_to)}
+    return {"header": header, **assemble_report(rows, auto_tags_order, tag_desc_by_norm)}
 
-    return {"header": header, "table_df": table_df, "reply_contacts_by_tag": reply_contacts_by_tag}
 
+def compute_group_reports(
+    df_in: pd.DataFrame,
+    cfg: dict,
+    segment: str,
+    funnel: str,
+    mode: str,
+    date_from: date | None,
+    date_to: date | None,
+    groups: CompiledGroups,
+    extra_tags: list[str] | None = None,  # appended to every group (e.g. the multiselect)
+    tag_index: TagIndex | None = None,
+    row_cache: TagRowCache | None = None,
+    dataset_key: str | None = None,
+    on_rows: Callable[[], None] | None = None,  # called once the union aggregation is done
+) -> Iterator[tuple[str, dict]]:
+    """Yield one report per group from a single aggregation over the union of group tags.
+
+    The aggregation runs when the first group is requested; groups are then
+    assembled and yielded one by one, so callers can show progress and stop
+    early. Each group's table equals `compute_report_by_tags` with the
+    group's tags (plus `extra_tags` not already in the group) and its
+    descriptions.
+    """
+    extra = [t for t in (extra_tags or []) if str(t).strip()]
+    union = list(dict.fromkeys(list(groups.union) + [str(t).strip().lower() for t in extra]))
+    header = _report_header(mode, date_from, date_to)
+    if not union:
+        return
+    with GROUP_REPORTS_SECONDS.time():
+        rows, _ = _report_rows(df_in, cfg, segment, funnel, mode, date_from, date_to, union, None, tag_index, row_cache, dataset_key)
+    by_key = {r.key: r for r in rows}
+    if on_rows is not None:
+        on_rows()
+
+    for g in groups.groups:
+        keys = list(g.norm) + [str(t).strip().lower() for t in extra if t not in g.tags]
+        res = assemble_report([by_key[k] for k in keys], False, g.desc_by_norm)
+        yield g.name, {"header": header, **res}
+
+
+def _report_rows(
+    df_in: pd.DataFrame,
+    cfg: dict,
+    segment: str,
+    funnel: str,
+    mode: str,
+    date_from: date | None,
+    date_to: date | None,
+    tags: list[str],
+    tag_queries: list[str] | None,
+    tag_index: TagIndex | None,
+    row_cache: TagRowCache | None,
+    dataset_key: str | None,
+) -> tuple[list[TagRow] | None, bool]:
+    """Validated input → tag rows via the configured backend, memoized when a cache is given."""
+    missing = [c for c in REQUIRED_COLS if c not in df_in.columns]
+    if missing:
+        raise ValueError(f"Не найдены колонки: {missing}")
 
+    chosen = [t for t in tags if str(t).strip()]
+    chosen_norm = [str(t).strip().lower() for t in chosen]
+    queries = [str(q).strip() for q in (tag_queries or []) if str(q).strip()]
+    if tag_index is not None and tag_index.dataset_key != dataset_key:
+        # Built for another frame (or passed without naming the dataset): rebuild from df_in
+        tag_index = None
+
+    backend = _polars_backend(cfg)
+
+    def compute(chosen_norm: list[str], queries: list[str]):
+        if backend is not None:
+            return backend.tag_rows(df_in, cfg, segment, funnel, mode, date_from, date_to, chosen_norm, queries)
+        return _tag_rows(df_in, cfg, segment, funnel, mode, date_from, date_to, chosen_norm, queries, tag_index)
+
+    if row_cache is not None and dataset_key is not None:
+        # Dates only filter in basket mode, so other modes share rows across date changes
+        dates = (date_from, date_to) if mode == "basket" else (None, None)
+        scope = (dataset_key, config_fingerprint(cfg), segment, funnel.strip().lower(), mode, *dates)
+        return _memo_tag_rows(row_cache, scope, compute, mode, chosen_norm, queries)
+    return compute(chosen_norm, queries)
@@ -0,0 +1,218 @@
+"""Polars backend for `compute_report_by_tags` (``compute.backend: polars`` in config).
+
+Normalization, tag splitting/explode and the per-tag aggregation run on
+polars' multi-threaded engine; only the exploded (row, tag) pairs are
+materialized, never a full-width frame. Ingestion still goes through pandas:
+the report gets the registry's pandas frame, and the six columns used here
+are converted with ``pl.from_pandas`` on every call (dates reuse the pandas
+day-first parse). Importing this module raises
+ImportError when polars is missing, and `report._polars_backend` then falls
+back to pandas.
+"""
+from __future__ import annotations
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from .report import TagRow, _metrics_from_counts, _stage_groups
+from .tag_index import eval_tag_query
+from .utils import only_date
+
+
+_TAG_SEPARATORS = [";", "|", "/", "\\"]  # mirrors utils.parse_tags
+_NO_WAZZAP_PATTERN = r"wazzap|wazzup|whats\s*app"  # mirrors utils.mask_no_wazzap
+
+_FLAGS = ["already", "closed", "lead_nd", "contact", "reply", "nowz"]
+
+
+def _norm(expr: pl.Expr) -> pl.Expr:
+    # Same as utils.normalize_series
+    return (
+        expr.fill_null("")
+        .str.strip_chars()
+        .str.to_lowercase()
+        .str.replace_all("ё", "е", literal=True)
+    )
+
+
+def _budget(expr: pl.Expr) -> pl.Expr:
+    # Same as utils.budget_to_float; unparsable values become null instead of raising
+    cleaned = expr.str.replace_all(",", ".", literal=True).str.replace_all(r"[^\d\.\-]", "")
+    return pl.when(cleaned == "").then(None).otherwise(cleaned).cast(pl.Float64, strict=False)
+
+
+def _dates(df_in: pd.DataFrame) -> pl.Series:
+    # Dates always come from pandas' day-first parse (utils.only_date), so both
+    # backends accept the same layouts
+    dates = df_in["__date"] if "__date" in df_in.columns else only_date(df_in["Дата создания"])
+    return pl.Series("date", pd.to_datetime(dates, errors="coerce")).dt.date()
+
+
+def _base_frame(df_in: pd.DataFrame, cfg: dict, segment: str, mode: str) -> pl.DataFrame:
+    """One row per deal: stage flags, budget and cleaned contact columns."""
+    groups = _stage_groups(cfg, segment, mode)
+    cols = {
+        "stage": df_in["Этап сделки"],
+        "funnel": df_in["Воронка"],
+        "budget_raw": df_in["Бюджет"],
+        "contact_raw": df_in["Основной контакт"],
+    }
+    if "ID" in df_in.columns:
+        # Only used to deduplicate contacts; records take the source values (see _aggregate)
+        cols["ID"] = df_in["ID"].astype(str).where(df_in["ID"].notna(), None)
+    raw = pl.from_pandas(pd.DataFrame({k: v.astype(object).where(v.notna(), None) for k, v in cols.items()}))
+
+    stage = pl.col("stage")
+    base = raw.with_columns(
+        _norm(pl.col("stage").cast(pl.Utf8)).alias("stage"),
+        _norm(pl.col("funnel").cast(pl.Utf8)).alias("funnel"),
+        _budget(pl.col("budget_raw").cast(pl.Utf8)).alias("budget"),
+        pl.col("contact_raw").cast(pl.Utf8).str.strip_chars().alias("contact_name"),
+    ).with_columns(
+        *[stage.is_in([x.lower() for x in groups[k]]).alias(k) for k in _FLAGS if k != "nowz"],
+        stage.is_in([x.lower() for x in groups["revenue"]]).alias("revenue"),
+        (stage.is_in([x.lower() for x in groups["nowz"]]) | stage.str.contains(_NO_WAZZAP_PATTERN)).alias("nowz"),
+    )
+    return base.with_columns(_dates(df_in))
+
+
+def _tag_pairs(df_in: pd.DataFrame) -> pl.DataFrame:
+    """Exploded (row, key, display) pairs in deal order, deduplicated like utils.parse_tags."""
+    tags = pl.Series("tags", df_in["Теги сделки"].astype(object).where(df_in["Теги сделки"].notna(), None), dtype=pl.Utf8)
+    expr = pl.col("tags").fill_null("")
+    for sep in _TAG_SEPARATORS:
+        expr = expr.str.replace_all(sep, ",", literal=True)
+    return (
+        pl.DataFrame({"tags": tags})
+        .with_row_index("row")
+        .select(pl.col("row"), expr.str.split(",").alias("display"))
+        .explode("display")
+        .with_columns(pl.col("display").str.strip_chars())
+        .filter(pl.col("display") != "")
+        .with_columns(pl.col("display").str.to_lowercase().alias("key"))
+        .unique(subset=["row", "key"], keep="first", maintain_order=True)
+    )
+
+
+class _Incidence:
+    """Bitset view over the exploded pairs so tag_index.eval_tag_query can be reused."""
+
+    def __init__(self, pairs: pl.DataFrame, n_rows: int):
+        self.n_rows = n_rows
+        self._pairs = pairs
+
+    def bitset(self, tag_norm: str) -> np.ndarray:
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self._pairs.filter(pl.col("key") == tag_norm)["row"].to_numpy()] = True
+        return np.packbits(mask)
+
+    def all_bitset(self) -> np.ndarray:
+        return np.packbits(np.ones(self.n_rows, dtype=bool))
+
+
+def _aggregate(pairs: pl.DataFrame, base: pl.DataFrame, ids: np.ndarray | None) -> tuple[dict, dict]:
+    """Per key: counts/budget/display over selected deals, and reply contacts.
+
+    Contact IDs are read back from `ids` (the source column) by row, so records
+    carry exactly the values the pandas backend returns.
+    """
+    has_id = ids is not None
+    joined = pl.concat([pairs, base.select(pl.all().gather(pairs["row"]))], how="horizontal")
+    joined = joined.filter(pl.col("sel"))
+    stats = joined.group_by("key", maintain_order=True).agg(
+        pl.len().alias("total"),
+        *[pl.col(k).sum().alias(k) for k in _FLAGS],
+        pl.col("budget").filter(pl.col("revenue")).sum().alias("budget"),
+        pl.col("display").first().alias("display"),
+    )
+
+    replied = joined.filter(pl.col("reply"))
+    reply_display = replied.group_by("key", maintain_order=True).agg(pl.col("display").first())
+    contact_cols = ["contact_name"] + (["ID"] if has_id else [])
+    contacts = (
+        replied.filter(pl.col("contact_name").is_not_null() & (pl.col("contact_name") != ""))
+        .select(["key", "row"] + contact_cols)
+        .unique(subset=["key"] + contact_cols, keep="first", maintain_order=True)
+        .group_by("key", maintain_order=True)
+        .agg(pl.col("contact_name"), pl.col("row"))
+    )
+
+    by_key = {r["key"]: r for r in stats.iter_rows(named=True)}
+    contacts_by_key: dict[str, tuple[str, list[dict]]] = {
+        r["key"]: (r["display"], []) for r in reply_display.iter_rows(named=True)
+    }
+    for r in contacts.iter_rows(named=True):
+        if has_id:
+            records = [{"Основной контакт": c, "ID": ids[i]} for c, i in zip(r["contact_name"], r["row"])]
+        else:
+            records = [{"Основной контакт": c} for c in r["contact_name"]]
+        contacts_by_key[r["key"]] = (contacts_by_key[r["key"]][0], records)
+    return by_key, contacts_by_key
+
+
+def _tag_row(mode: str, key: str, display: str, stats: dict | None, contacts: tuple[str, list[dict]] | None) -> TagRow:
+    if stats is None:
+        metrics = _metrics_from_counts(mode, 0, 0, 0, 0, 0, 0, 0, 0.0)
+    else:
+        display = stats["display"] if display is None else display
+        metrics = _metrics_from_counts(
+            mode,
+            int(stats["total"]),
+            n_already=int(stats["already"]),
+            n_closed=int(stats["closed"]),
+            n_lead_nd=int(stats["lead_nd"]),
+            n_nowz=int(stats["nowz"]),
+            contact=int(stats["contact"]),
+            reply=int(stats["reply"]),
+            budget=float(stats["budget"] or 0.0),
+        )
+    contacts_key, records = contacts if contacts is not None else (key, [])
+    return TagRow(key, key if display is None else display, metrics, contacts_key, records)
+
+
+def tag_rows(
+    df_in: pd.DataFrame,
+    cfg: dict,
+    segment: str,
+    funnel: str,
+    mode: str,
+    date_from: date | None,
+    date_to: date | None,
+    chosen_norm: list[str],
+    queries: list[str],
+) -> tuple[list[TagRow] | None, bool]:
+    """Same contract as `report._tag_rows`."""
+    base = _base_frame(df_in, cfg, segment, mode)
+    sel = pl.col("funnel") == funnel.strip().lower()
+    if mode == "basket" and date_from is not None and date_to is not None:
+        sel = sel & (pl.col("date") >= date_from) & (pl.col("date") <= date_to)
+    base = base.with_columns(sel.fill_null(False).alias("sel"))
+    ids = df_in["ID"].to_numpy() if "ID" in df_in.columns else None
+
+    all_pairs = pairs = _tag_pairs(df_in)
+    auto_tags_order = False
+    if not chosen_norm and not queries:
+        # First appearance among selected deals; pairs are already in (deal, slot) order
+        selected = base["sel"].to_numpy()
+        chosen_norm = pairs.filter(pl.Series(selected[pairs["row"].to_numpy()]))["key"].unique(maintain_order=True).to_list()
+        auto_tags_order = True
+        if not chosen_norm and mode == "basket":
+            return None, auto_tags_order
+    else:
+        pairs = pairs.filter(pl.col("key").is_in(chosen_norm))
+
+    stats, contacts = _aggregate(pairs, base, ids)
+    out = [_tag_row(mode, key, None, stats.get(key), contacts.get(key)) for key in chosen_norm]
+
+    if queries:
+        incidence = _Incidence(all_pairs, len(df_in))
+        for q in queries:
+            rows = np.flatnonzero(eval_tag_query(incidence, q))
+            q_pairs = pl.DataFrame({"row": rows.astype(np.uint32), "display": [q] * len(rows), "key": [q] * len(rows)},
+                                   schema={"row": pl.UInt32, "display": pl.Utf8, "key": pl.Utf8})
+            q_stats, q_contacts = _aggregate(q_pairs, base, ids)
+            out.append(_tag_row(mode, q, q, q_stats.get(q), q_contacts.get(q)))
+    return out, auto_tags_order
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Tuple
+import threading
+
+from .metrics import TAG_ROWS_REQUESTS
+from .registry import approx_nbytes
+
+
+Scope = Tuple[Hashable, ...]
+
+
+class TagRowCache:
+    """Process-wide LRU of computed report rows.
+
+    Entries are keyed by a report scope (dataset, config fingerprint, segment,
+    funnel, mode, dates) and a row key such as ``("tag", "paid")``, so a new
+    selection only computes the tags that were not seen in the same scope
+    before, and group runs sharing tags reuse each other's rows.
+    """
+
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = int(max_entries)
+        self._lock = threading.Lock()
+        # (scope, key) -> (value, approximate size in bytes)
+        self._items: "OrderedDict[Tuple[Scope, Hashable], Tuple[Any, int]]" = OrderedDict()
+        self._nbytes = 0
+
+    def get(self, scope: Scope, key: Hashable) -> Any | None:
+        return self.get_many(scope, [key]).get(key)
+
+    def get_many(self, scope: Scope, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        found = {}
+        misses = 0
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                entry = self._items.get((scope, key))
+                if entry is None:
+                    misses += 1
+                    continue
+                self._items.move_to_end((scope, key))
+                found[key] = entry[0]
+        if found:
+            TAG_ROWS_REQUESTS.inc(len(found), result="hit")
+        if misses:
+            TAG_ROWS_REQUESTS.inc(misses, result="miss")
+        return found
+
+    def put_many(self, scope: Scope, items: Dict[Hashable, Any]) -> None:
+        sized = {key: (value, approx_nbytes(value)) for key, value in items.items()}
+        with self._lock:
+            for key, entry in sized.items():
+                previous = self._items.pop((scope, key), None)
+                if previous is not None:
+                    self._nbytes -= previous[1]
+                self._items[(scope, key)] = entry
+                self._nbytes += entry[1]
+            while len(self._items) > self.max_entries:
+                self._nbytes -= self._items.popitem(last=False)[1][1]
+
+    def nbytes(self) -> int:
+        with self._lock:
+            return self._nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._nbytes = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
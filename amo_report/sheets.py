@@ -1,12 +1,75 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator
+import time
 
-import gspread
 import pandas as pd
 
+from .metrics import SHEETS_CALL_SECONDS, SHEETS_ERRORS, SHEETS_RETRIES
+
+if TYPE_CHECKING:
+    import gspread
+
+# gspread (and oauth2client/google-auth behind it) is imported on first use:
+# most sessions never export, and it costs a large share of a cold start.
+
+
+# Quota (429) and transient server errors are retried with exponential backoff.
+# Non-idempotent calls (add_worksheet) only retry 429: the request was rejected
+# before it ran, while after a 5xx the sheet may already exist.
+RETRY_STATUSES = (429, 500, 502, 503)
+NON_IDEMPOTENT_RETRY_STATUSES = (429,)
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 1.0
+
+
+def _call(method: str, fn: Callable, *args, _retry_on: tuple = RETRY_STATUSES, _attempts: int = MAX_ATTEMPTS, **kwargs):
+    """Run one Sheets API call, recording latency/errors and retrying `_retry_on` statuses.
+
+    `_attempts` caps the tries for this call; interactive paths pass 1 so a
+    rerun never sits in backoff.
+    """
+    from gspread.exceptions import APIError
+
+    delay = BACKOFF_SECONDS
+    for attempt in range(1, _attempts + 1):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except APIError as ex:
+            status = getattr(getattr(ex, "response", None), "status_code", None)
+            SHEETS_ERRORS.inc(method=method, status=status or "unknown")
+            if status not in _retry_on or attempt >= _attempts:
+                raise
+            SHEETS_RETRIES.inc(method=method)
+            time.sleep(delay)
+            delay *= 2
+        finally:
+            SHEETS_CALL_SECONDS.observe(time.perf_counter() - start, method=method)
+
+
+# Optional replacement for the real client (see sheets_emulator); None in production
+_client_factory: Callable[[Dict[str, Any]], Any] | None = None
+
+
+@contextmanager
+def client_override(factory: Callable[[Dict[str, Any]], Any]) -> Iterator[None]:
+    """Route every export/tags-cache call through `factory(creds_dict)` instead of gspread."""
+    global _client_factory
+    previous = _client_factory
+    _client_factory = factory
+    try:
+        yield
+    finally:
+        _client_factory = previous
+
 
 def _get_client_from_creds_dict(creds_dict: Dict[str, Any]) -> gspread.Client:
+    if _client_factory is not None:
+        return _client_factory(creds_dict)
+    import gspread
+
     try:
         # Prefer native helper if available
         client = gspread.service_account_from_dict(creds_dict)
@@ -24,12 +87,32 @@ def _get_client_from_creds_dict(creds_dict: Dict[str, Any]) -> gspread.Client:
 
 
 def _ensure_worksheet(spreadsheet: gspread.Spreadsheet, title: str, rows: int = 1000, cols: int = 26):
+    from gspread.exceptions import WorksheetNotFound
+
+    try:
+        ws = _call("worksheet", spreadsheet.worksheet, title)
+        _call("clear", ws.clear)
+        return ws
+    except WorksheetNotFound:
+        return _add_worksheet(spreadsheet, title, rows, cols)
+
+
+def _add_worksheet(spreadsheet: gspread.Spreadsheet, title: str, rows: int, cols: int):
+    """add_worksheet without 5xx retries; an "already exists" answer reuses that sheet."""
+    from gspread.exceptions import APIError
+
     try:
-        ws = spreadsheet.worksheet(title)
-        ws.clear()
+        return _call(
+            "add_worksheet", spreadsheet.add_worksheet, title=title, rows=str(rows), cols=str(cols),
+            _retry_on=NON_IDEMPOTENT_RETRY_STATUSES,
+        )
+    except APIError as ex:
+        if "already exists" not in str(ex):
+            raise
+        # Created by an earlier attempt whose response was lost, or by a concurrent export
+        ws = _call("worksheet", spreadsheet.worksheet, title)
+        _call("clear", ws.clear)
         return ws
-    except gspread.exceptions.WorksheetNotFound:
-        return spreadsheet.add_worksheet(title=title, rows=str(rows), cols=str(cols))
 
 
 def _dataframe_to_values(df: pd.DataFrame) -> list[list]:
@@ -46,7 +129,7 @@ def export_two_tabs(
     contacts_df: pd.DataFrame,
 ) -> None:
     client = _get_client_from_creds_dict(creds_dict)
-    sh = client.open_by_key(spreadsheet_id)
+    sh = _call("open_by_key", client.open_by_key, spreadsheet_id)
 
     title_report = f"{base_name} | Отчёт"
     title_contacts = f"{base_name} | Список_Отклик"
@@ -54,8 +137,8 @@ def export_two_tabs(
     ws_report = _ensure_worksheet(sh, title_report, rows=max(len(report_df) + 10, 100), cols=max(len(report_df.columns) + 2, 10))
     ws_contacts = _ensure_worksheet(sh, title_contacts, rows=max(len(contacts_df) + 10, 100), cols=max(len(contacts_df.columns) + 2, 6))
 
-    ws_report.update(_dataframe_to_values(report_df))
-    ws_contacts.update(_dataframe_to_values(contacts_df))
+    _call("update", ws_report.update, _dataframe_to_values(report_df))
+    _call("update", ws_contacts.update, _dataframe_to_values(contacts_df))
 
 
 def export_group_result(
@@ -66,12 +149,12 @@ def export_group_result(
     contacts_df: pd.DataFrame,
 ) -> None:
     client = _get_client_from_creds_dict(creds_dict)
-    sh = client.open_by_key(spreadsheet_id)
+    sh = _call("open_by_key", client.open_by_key, spreadsheet_id)
     title_report = f"Group | {group_name} | Отчёт"
     title_contacts = f"Group | {group_name} | Список_Отклик"
     ws_report = _ensure_worksheet(sh, title_report, rows=max(len(report_df) + 10, 100), cols=max(len(report_df.columns) + 2, 10))
     ws_contacts = _ensure_worksheet(sh, title_contacts, rows=max(len(contacts_df) + 10, 100), cols=max(len(contacts_df.columns) + 2, 6))
-    ws_report.update(_dataframe_to_values(report_df))
-    ws_contacts.update(_dataframe_to_values(contacts_df))
+    _call("update", ws_report.update, _dataframe_to_values(report_df))
+    _call("update", ws_contacts.update, _dataframe_to_values(contacts_df))
 
 
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+import json
+import random
+import threading
+import time
+
+import gspread
+
+from .sheets import client_override
+
+
+class _Response:
+    """Just enough of requests.Response for gspread.exceptions.APIError."""
+
+    def __init__(self, status: int, message: str):
+        self.status_code = status
+        self.text = message
+        self._payload = {"error": {"code": status, "message": message, "status": "EMULATED"}}
+
+    def json(self) -> dict:
+        return self._payload
+
+
+class SheetsEmulator:
+    """In-process stand-in for the gspread Client/Spreadsheet/Worksheet subset we use.
+
+    Every emulated API call sleeps `latency` (± `jitter`) seconds, is counted
+    in `calls` by method name, and may fail with an injected HTTP error:
+    queued ones (`fail_next`), random ones (`error_rate`) or 429 when more than
+    `quota_per_minute` calls land inside a sliding 60s window.
+
+        emu = SheetsEmulator(latency=0.2)
+        with emu.install():
+            export_two_tabs("sheet-id", {}, "RUS", report_df, contacts_df)
+        emu.calls  # Counter({'update': 2, 'worksheet': 2, ...})
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        quota_per_minute: int | None = None,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        seed: int | None = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.quota_per_minute = quota_per_minute
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._failures: deque = deque()
+        self._window: deque = deque()
+        self._spreadsheets: Dict[str, EmulatedSpreadsheet] = {}
+
+    # --- test/benchmark controls -------------------------------------------
+
+    def fail_next(self, method: str | None = None, status: int = 429, times: int = 1) -> None:
+        """Queue `times` failures with `status` for `method` (any method if None)."""
+        with self._lock:
+            for _ in range(times):
+                self._failures.append((method, status))
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+
+    def spreadsheet(self, key: str) -> "EmulatedSpreadsheet":
+        with self._lock:
+            sh = self._spreadsheets.get(key)
+            if sh is None:
+                sh = self._spreadsheets[key] = EmulatedSpreadsheet(self, key)
+            return sh
+
+    def client(self, creds_dict: Dict[str, Any] | None = None) -> "EmulatedClient":
+        return EmulatedClient(self)
+
+    @contextmanager
+    def install(self) -> Iterator["SheetsEmulator"]:
+        """Make amo_report.sheets / tags_cache talk to this emulator."""
+        with client_override(self.client):
+            yield self
+
+    # --- request path ------------------------------------------------------
+
+    def _api(self, method: str) -> None:
+        delay = self.latency + (self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self.calls[method] += 1
+            status = self._pick_failure(method)
+            if status is None and self.quota_per_minute is not None:
+                now = time.monotonic()
+                while self._window and now - self._window[0] > 60.0:
+                    self._window.popleft()
+                if len(self._window) >= self.quota_per_minute:
+                    status = 429
+                else:
+                    self._window.append(now)
+            if status is None and self.error_rate and self._rng.random() < self.error_rate:
+                status = self.error_status
+            if status is not None:
+                self.errors[(method, status)] += 1
+        if status is not None:
+            raise gspread.exceptions.APIError(_Response(status, f"emulated {status} on {method}"))
+
+    def _pick_failure(self, method: str) -> int | None:
+        for i, (m, status) in enumerate(self._failures):
+            if m is None or m == method:
+                del self._failures[i]
+                return status
+        return None
+
+
+class EmulatedClient:
+    def __init__(self, emulator: SheetsEmulator):
+        self._emu = emulator
+
+    def open_by_key(self, key: str) -> "EmulatedSpreadsheet":
+        self._emu._api("open_by_key")
+        return self._emu.spreadsheet(key)
+
+
+class EmulatedSpreadsheet:
+    def __init__(self, emulator: SheetsEmulator, key: str):
+        self._emu = emulator
+        self.id = key
+        self._worksheets: Dict[str, EmulatedWorksheet] = {}
+
+    def worksheets(self) -> List["EmulatedWorksheet"]:
+        self._emu._api("worksheets")
+        return list(self._worksheets.values())
+
+    def worksheet(self, title: str) -> "EmulatedWorksheet":
+        self._emu._api("worksheet")
+        ws = self._worksheets.get(title)
+        if ws is None:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return ws
+
+    def add_worksheet(self, title: str, rows: int | str, cols: int | str) -> "EmulatedWorksheet":
+        self._emu._api("add_worksheet")
+        if title in self._worksheets:
+            raise gspread.exceptions.APIError(
+                _Response(400, f'A sheet with the name "{title}" already exists.')
+            )
+        ws = self._worksheets[title] = EmulatedWorksheet(self._emu, title, int(rows), int(cols))
+        return ws
+
+
+class EmulatedWorksheet:
+    def __init__(self, emulator: SheetsEmulator, title: str, rows: int, cols: int):
+        self._emu = emulator
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self._values: List[List[str]] = []
+
+    def clear(self) -> None:
+        self._emu._api("clear")
+        self._values = []
+
+    def update(self, values: List[List[Any]], *args, **kwargs) -> dict:
+        self._emu._api("update")
+        # Values must be JSON-serializable, as in a real request body
+        json.dumps(values)
+        rendered = [["" if v is None else str(v) for v in row] for row in values]
+        for i, row in enumerate(rendered):
+            if i < len(self._values):
+                self._values[i][: len(row)] = row
+            else:
+                self._values.append(row)
+        self.row_count = max(self.row_count, len(self._values))
+        self.col_count = max([self.col_count] + [len(r) for r in rendered])
+        return {"updatedRows": len(rendered), "updatedCells": sum(len(r) for r in rendered)}
+
+    def get_all_values(self) -> List[List[str]]:
+        self._emu._api("get_all_values")
+        width = max((len(r) for r in self._values), default=0)
+        return [r + [""] * (width - len(r)) for r in self._values]
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import List, Dict, Tuple
+import hashlib
 import io
 import pandas as pd
 
@@ -60,3 +61,30 @@ def parse_tag_groups_excel(file_bytes: bytes) -> List[TagGroup]:
     return groups
 
 
+@dataclass(frozen=True)
+class CompiledGroup:
+    name: str
+    tags: Tuple[str, ...]  # as written in the file
+    norm: Tuple[str, ...]  # report keys (strip + lower), parallel to `tags`
+    desc_by_norm: Dict[str, str]  # keyed like `norm`
+
+
+@dataclass(frozen=True)
+class CompiledGroups:
+    """Tag groups of one file, parsed once and ready for a batch report."""
+
+    key: str  # sha256 of the file bytes
+    groups: Tuple[CompiledGroup, ...]
+    union: Tuple[str, ...]  # every group tag once, in file order
+
+
+def compile_tag_groups(file_bytes: bytes) -> CompiledGroups:
+    compiled = []
+    union: Dict[str, None] = {}
+    for tg in parse_tag_groups_excel(file_bytes):
+        norm = tuple(t.strip().lower() for t in tg.tags)
+        # desc_by_norm is keyed by _norm_tag (ё → е); re-key it like the report rows
+        desc = {n: tg.desc_by_norm.get(_norm_tag(t), "") for t, n in zip(tg.tags, norm)}
+        compiled.append(CompiledGroup(tg.name, tuple(tg.tags), norm, desc))
+        union.update(dict.fromkeys(norm))
+    return CompiledGroups(hashlib.sha256(file_bytes).hexdigest(), tuple(compiled), tuple(union))
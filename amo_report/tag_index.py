@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+import re
+
+import numpy as np
+import pandas as pd
+
+from .utils import parse_tags
+
+
+@dataclass(frozen=True)
+class TagIndex:
+    """Compact deal × tag incidence (CSR by tag) over positional deal rows.
+
+    Entries of tag ``i`` live in ``[offsets[i], offsets[i + 1])`` of the
+    parallel arrays: ``rows`` (deal position, ascending), ``slots`` (position
+    of the tag inside the deal's tag list) and ``variant`` (index into
+    ``variants``, the tag spelling as written in that deal).
+
+    ``dataset_key`` names the frame the index was built for (the registry
+    content hash); the report only uses an index whose key matches its own.
+    """
+
+    n_rows: int
+    tags: Tuple[str, ...]
+    offsets: np.ndarray
+    rows: np.ndarray
+    slots: np.ndarray
+    variant: np.ndarray
+    variants: Tuple[str, ...]
+    dataset_key: str | None = None
+    _pos: Dict[str, int] = field(default_factory=dict, repr=False, compare=False)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.offsets.nbytes + self.rows.nbytes + self.slots.nbytes + self.variant.nbytes)
+
+    def _span(self, tag_norm: str) -> slice | None:
+        i = self._pos.get(tag_norm)
+        if i is None:
+            return None
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def rows_of(self, tag_norm: str) -> np.ndarray:
+        span = self._span(tag_norm)
+        if span is None:
+            return np.empty(0, dtype=self.rows.dtype)
+        return self.rows[span]
+
+    def display_of(self, tag_norm: str, within: np.ndarray | None = None) -> str:
+        """Spelling of the tag in the first deal (optionally restricted to a row mask)."""
+        span = self._span(tag_norm)
+        if span is None:
+            return tag_norm
+        rows = self.rows[span]
+        hits = np.flatnonzero(within[rows]) if within is not None else np.arange(len(rows))
+        if len(hits) == 0:
+            return tag_norm
+        return self.variants[int(self.variant[span][hits[0]])]
+
+    def ordered_tags(self, within: np.ndarray | None = None) -> list[str]:
+        """Tags in order of first appearance (deal order, then order inside the deal)."""
+        firsts = []
+        for i, tag in enumerate(self.tags):
+            rows = self.rows[self.offsets[i]:self.offsets[i + 1]]
+            slots = self.slots[self.offsets[i]:self.offsets[i + 1]]
+            hits = np.flatnonzero(within[rows]) if within is not None else np.arange(len(rows))
+            if len(hits):
+                firsts.append((int(rows[hits[0]]), int(slots[hits[0]]), tag))
+        firsts.sort()
+        return [t for _, _, t in firsts]
+
+    def bitset(self, tag_norm: str) -> np.ndarray:
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.rows_of(tag_norm)] = True
+        return np.packbits(mask)
+
+    def all_bitset(self) -> np.ndarray:
+        return np.packbits(np.ones(self.n_rows, dtype=bool))
+
+
+def build_tag_index(tags_col: pd.Series, dataset_key: str | None = None) -> TagIndex:
+    pos: Dict[str, int] = {}
+    tags: List[str] = []
+    per_tag: List[List[Tuple[int, int, int]]] = []
+    variant_pos: Dict[str, int] = {}
+    variants: List[str] = []
+    for r, raw in enumerate(tags_col.tolist()):
+        for slot, t in enumerate(parse_tags(raw)):
+            key = t.lower()
+            i = pos.get(key)
+            if i is None:
+                i = pos[key] = len(tags)
+                tags.append(key)
+                per_tag.append([])
+            v = variant_pos.get(t)
+            if v is None:
+                v = variant_pos[t] = len(variants)
+                variants.append(t)
+            per_tag[i].append((r, slot, v))
+
+    sizes = np.fromiter((len(x) for x in per_tag), dtype=np.int64, count=len(per_tag))
+    offsets = np.zeros(len(tags) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    flat = [e for entries in per_tag for e in entries]
+    arr = np.array(flat, dtype=np.int64).reshape(-1, 3)
+    return TagIndex(
+        n_rows=len(tags_col),
+        tags=tuple(tags),
+        offsets=offsets,
+        rows=arr[:, 0].astype(np.int32),
+        slots=arr[:, 1].astype(np.int16),
+        variant=arr[:, 2].astype(np.int32),
+        variants=tuple(variants),
+        dataset_key=dataset_key,
+        _pos=pos,
+    )
+
+
+# --- boolean tag queries -------------------------------------------------
+#
+#   expr   := term (OR term)*
+#   term   := factor (AND factor)*
+#   factor := NOT factor | "(" expr ")" | TAG
+#
+# Operators are case-insensitive standalone words (AND/OR/NOT, И/ИЛИ/НЕ, & | !).
+# Tags with spaces or operator words must be quoted: "rock and roll".
+
+_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+_OPS = {"and": "AND", "и": "AND", "&": "AND", "or": "OR", "или": "OR", "|": "OR", "not": "NOT", "не": "NOT", "!": "NOT"}
+
+
+def _tokenize(expr: str) -> list[tuple[str, str]]:
+    out: list[tuple[str, str]] = []
+    pos = 0
+    expr = expr.strip()
+    while pos < len(expr):
+        m = _TOKEN_RE.match(expr, pos)
+        if not m or m.end() == pos:
+            raise ValueError(f"Не удалось разобрать запрос: {expr!r}")
+        pos = m.end()
+        lpar, rpar, quoted, word = m.groups()
+        if lpar:
+            out.append(("(", lpar))
+        elif rpar:
+            out.append((")", rpar))
+        elif quoted is not None:
+            out.append(("TAG", quoted))
+        elif word.lower() in _OPS:
+            out.append((_OPS[word.lower()], word))
+        else:
+            out.append(("TAG", word))
+    return out
+
+
+def parse_tag_query(expr: str):
+    """Parse a boolean tag expression into a nested tuple AST.
+
+    Nodes: ``("tag", norm)``, ``("not", node)``, ``("and", a, b)``, ``("or", a, b)``.
+    """
+    tokens = _tokenize(expr)
+    i = 0
+
+    def peek():
+        return tokens[i][0] if i < len(tokens) else None
+
+    def take(kind: str):
+        nonlocal i
+        if peek() != kind:
+            found = tokens[i][1] if i < len(tokens) else "конец строки"
+            raise ValueError(f"Ошибка в запросе {expr!r}: ожидалось {kind}, найдено {found!r}")
+        i += 1
+        return tokens[i - 1]
+
+    def parse_expr():
+        node = parse_term()
+        while peek() == "OR":
+            take("OR")
+            node = ("or", node, parse_term())
+        return node
+
+    def parse_term():
+        node = parse_factor()
+        while peek() == "AND":
+            take("AND")
+            node = ("and", node, parse_factor())
+        return node
+
+    def parse_factor():
+        if peek() == "NOT":
+            take("NOT")
+            return ("not", parse_factor())
+        if peek() == "(":
+            take("(")
+            node = parse_expr()
+            take(")")
+            return node
+        return ("tag", take("TAG")[1].strip().lower())
+
+    node = parse_expr()
+    if i != len(tokens):
+        raise ValueError(f"Ошибка в запросе {expr!r}: лишний фрагмент {tokens[i][1]!r}")
+    return node
+
+
+def eval_tag_query(index: TagIndex, expr: str) -> np.ndarray:
+    """Evaluate `expr` on packed bitsets; returns a boolean mask over deal rows."""
+
+    def ev(node) -> np.ndarray:
+        kind = node[0]
+        if kind == "tag":
+            return index.bitset(node[1])
+        if kind == "not":
+            return np.bitwise_xor(ev(node[1]), index.all_bitset())
+        if kind == "and":
+            return np.bitwise_and(ev(node[1]), ev(node[2]))
+        return np.bitwise_or(ev(node[1]), ev(node[2]))
+
+    bits = ev(parse_tag_query(expr))
+    return np.unpackbits(bits, count=index.n_rows).astype(bool)
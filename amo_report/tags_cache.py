@@ -4,7 +4,8 @@ from pathlib import Path
 from typing import List, Tuple, Dict, Any
 import json
 from datetime import datetime
-from .sheets import _get_client_from_creds_dict
+from .metrics import TAGS_CACHE_REQUESTS, TAGS_CACHE_SECONDS, timed
+from .sheets import MAX_ATTEMPTS, _add_worksheet, _call, _get_client_from_creds_dict
 
 
 def _resolve_cache_path(preferred: str = "AMO_CRM_Report/tags_cache.json", fallback: str = "tags_cache.json") -> Path:
@@ -14,20 +15,25 @@ def _resolve_cache_path(preferred: str = "AMO_CRM_Report/tags_cache.json", fallb
     return Path(fallback)
 
 
+@timed(TAGS_CACHE_SECONDS, op="load", backend="local")
 def load_tags_cache(path: str | Path | None = None) -> Tuple[List[str], Dict[str, Any]]:
     cache_path = _resolve_cache_path() if path is None else Path(path)
     if not cache_path.exists():
+        TAGS_CACHE_REQUESTS.inc(op="load", backend="local", result="miss")
         return [], {"updated_at": None}
     try:
         with open(cache_path, "r", encoding="utf-8") as f:
             data = json.load(f)
         tags = data.get("tags", [])
         meta = {k: v for k, v in data.items() if k != "tags"}
+        TAGS_CACHE_REQUESTS.inc(op="load", backend="local", result="hit" if tags else "miss")
         return tags, meta
     except Exception:
+        TAGS_CACHE_REQUESTS.inc(op="load", backend="local", result="error")
         return [], {"updated_at": None}
 
 
+@timed(TAGS_CACHE_SECONDS, op="save", backend="local")
 def save_tags_cache(tags: List[str], path: str | Path | None = None) -> Path:
     cache_path = _resolve_cache_path() if path is None else Path(path)
     cache_path.parent.mkdir(parents=True, exist_ok=True)
@@ -37,6 +43,7 @@ def save_tags_cache(tags: List[str], path: str | Path | None = None) -> Path:
     }
     with open(cache_path, "w", encoding="utf-8") as f:
         json.dump(payload, f, ensure_ascii=False, indent=2)
+    TAGS_CACHE_REQUESTS.inc(op="save", backend="local", result="ok")
     return cache_path
 
 
@@ -45,17 +52,25 @@ def _tags_ws_title(key: str | None) -> str:
     return base
 
 
-def load_tags_cache_gs(spreadsheet_id: str, creds_dict: Dict[str, Any], key: str | None = None) -> Tuple[List[str], Dict[str, Any]]:
+@timed(TAGS_CACHE_SECONDS, op="load", backend="gs")
+def load_tags_cache_gs(
+    spreadsheet_id: str,
+    creds_dict: Dict[str, Any],
+    key: str | None = None,
+    attempts: int = MAX_ATTEMPTS,  # per API call; the app passes 1 since this runs on every rerun
+) -> Tuple[List[str], Dict[str, Any]]:
     try:
         client = _get_client_from_creds_dict(creds_dict)
-        sh = client.open_by_key(spreadsheet_id)
+        sh = _call("open_by_key", client.open_by_key, spreadsheet_id, _attempts=attempts)
         title = _tags_ws_title(key)
         try:
-            ws = sh.worksheet(title)
+            ws = _call("worksheet", sh.worksheet, title, _attempts=attempts)
         except Exception:
+            TAGS_CACHE_REQUESTS.inc(op="load", backend="gs", result="miss")
             return [], {"updated_at": None}
-        values = ws.get_all_values()
+        values = _call("get_all_values", ws.get_all_values, _attempts=attempts)
         if not values:
+            TAGS_CACHE_REQUESTS.inc(op="load", backend="gs", result="miss")
             return [], {"updated_at": None}
         # Expect header in first row: ["tag", "updated_at"]
         headers = values[0]
@@ -63,23 +78,25 @@ def load_tags_cache_gs(spreadsheet_id: str, creds_dict: Dict[str, Any], key: str
         if len(headers) > 1:
             updated_at = headers[1]
         tags = [row[0] for row in values[1:] if row and row[0]]
+        TAGS_CACHE_REQUESTS.inc(op="load", backend="gs", result="hit" if tags else "miss")
         return tags, {"updated_at": updated_at}
     except Exception:
+        TAGS_CACHE_REQUESTS.inc(op="load", backend="gs", result="error")
         return [], {"updated_at": None}
 
 
+@timed(TAGS_CACHE_SECONDS, op="save", backend="gs")
 def save_tags_cache_gs(tags: List[str], spreadsheet_id: str, creds_dict: Dict[str, Any], key: str | None = None) -> None:
     client = _get_client_from_creds_dict(creds_dict)
-    sh = client.open_by_key(spreadsheet_id)
+    sh = _call("open_by_key", client.open_by_key, spreadsheet_id)
     title = _tags_ws_title(key)
     try:
-        ws = sh.worksheet(title)
-        ws.clear()
+        ws = _call("worksheet", sh.worksheet, title)
+        _call("clear", ws.clear)
     except Exception:
-        ws = sh.add_worksheet(title=title, rows="1000", cols="3")
+        ws = _add_worksheet(sh, title, rows=1000, cols=3)
     unique_sorted = sorted(list({t for t in tags if str(t).strip()}))
     updated_at = datetime.utcnow().isoformat(timespec="seconds") + "Z"
     values = [["tag", updated_at]] + [[t] for t in unique_sorted]
-    ws.update(values)
-
-
+    _call("update", ws.update, values)
+    TAGS_CACHE_REQUESTS.inc(op="save", backend="gs", result="ok")
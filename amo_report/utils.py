@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import date, timedelta
-from typing import List, Optional, Set
+from typing import List
 import re
 
 import numpy as np
@@ -45,12 +45,6 @@ def budget_to_float(s: pd.Series) -> pd.Series:
     return x
 
 
-def sum_budget(df: pd.DataFrame) -> float:
-    if "__budget_float" in df.columns:
-        return float(np.nansum(df["__budget_float"]))
-    return float(np.nansum(budget_to_float(df["Бюджет"])))
-
-
 def mask_no_wazzap(df: pd.DataFrame, stage_list: List[str]) -> pd.Series:
     """Return mask for 'no wazzap/whatsapp' stages using exact list OR common patterns.
 
@@ -81,38 +75,3 @@ def parse_tags(s: str) -> list[str]:
             out.append(t)
     return out
 
-
-def explode_by_tags(df: pd.DataFrame, include_norm_tags: Optional[Set[str]] = None) -> pd.DataFrame:
-    include = {t.strip().lower() for t in include_norm_tags} if include_norm_tags else None
-    def _filter_tags(raw: str) -> list[str]:
-        lst = parse_tags(raw)
-        if include is None:
-            return lst
-        out: list[str] = []
-        for t in lst:
-            if t.strip().lower() in include:
-                out.append(t)
-        return out
-
-    tags_series = df["Теги сделки"].apply(_filter_tags)
-    df = df.copy()
-    df["__tags_list"] = tags_series
-    exploded = df.explode("__tags_list", ignore_index=True)
-    # Fast normalization using vectorized ops
-    exploded["__tag_display"] = exploded["__tags_list"].fillna("")
-    exploded["__tag_norm"] = exploded["__tag_display"].astype(str).str.strip().str.lower()
-    return exploded[exploded["__tag_norm"] != ""]
-
-
-def collect_unique_norm_tags(df: pd.DataFrame) -> list[str]:
-    seen: Set[str] = set()
-    order: list[str] = []
-    for raw in df["Теги сделки"].dropna().astype(str):
-        for t in parse_tags(raw):
-            key = t.strip().lower()
-            if key and key not in seen:
-                seen.add(key)
-                order.append(key)
-    return order
-
-
@@ -1,8 +1,12 @@
+import hashlib
+import math
+import os
+
 import streamlit as st
 import pandas as pd
 from datetime import date
 from amo_report.config import load_config
-from amo_report.report import compute_report_by_tags
+from amo_report.report import compute_group_reports, compute_report_by_tags, contacts_frame, prepare_dataset
 from amo_report.utils import parse_tags
 from amo_report.sheets import export_two_tabs
 from amo_report.tags_cache import (
@@ -11,7 +15,11 @@ from amo_report.tags_cache import (
     load_tags_cache_gs,
     save_tags_cache_gs,
 )
-from amo_report.tag_groups import parse_tag_groups_excel, TagGroup
+from amo_report.tag_groups import compile_tag_groups, CompiledGroups
+from amo_report.jobs import JobScheduler, Job, job_key, FAILED, CANCELLED
+from amo_report.registry import Dataset, DatasetHandle, DatasetRegistry, approx_nbytes
+from amo_report.row_cache import TagRowCache
+from amo_report.metrics import REGISTRY as METRICS, start_metrics_server
 
 st.set_page_config(page_title="AmoCRM → Отчёт по тегам", layout="wide")
 st.title("AmoCRM → Отчёт с разрезом по тегам")
@@ -25,43 +33,252 @@ def get_cfg():
         return load_config("config.yaml")
 
 
-@st.cache_data(show_spinner=False)
-def compute_cached(df_in: pd.DataFrame, cfg: dict, segment: str, funnel: str, mode: str, date_from, date_to, selected_tags: list[str]):
+@st.cache_resource
+def start_metrics():
+    # Prometheus text endpoint on a side port, e.g. METRICS_PORT=9100 → http://host:9100/metrics
+    port = os.environ.get("METRICS_PORT")
+    if not port:
+        return None
+    try:
+        return start_metrics_server(int(port))
+    except OSError:
+        return None
+
+
+@st.cache_resource
+def get_scheduler() -> JobScheduler:
+    # One scheduler per process so identical jobs from different sessions are shared
+    return JobScheduler(max_workers=2, sizeof=approx_nbytes)
+
+
+@st.cache_resource
+def get_row_cache() -> TagRowCache:
+    # Per-tag rows shared by all sessions: changing the selection computes only new tags
+    max_entries = get_cfg().get("registry", {}).get("tag_rows_max_entries", 20000)
+    return TagRowCache(max_entries=int(max_entries))
+
+
+# Cached functions take a DatasetHandle: keyed by upload hash + config fingerprint, not by cell contents
+HANDLE_HASH_FUNCS = {DatasetHandle: lambda h: h.token}
+
+
+@st.cache_data(show_spinner=False, hash_funcs=HANDLE_HASH_FUNCS)
+def compute_cached(handle: DatasetHandle, segment: str, funnel: str, mode: str, date_from, date_to, selected_tags: list[str], tag_queries: list[str]):
     return compute_report_by_tags(
-        df_in=df_in,
-        cfg=cfg,
+        df_in=handle.dataset.df,
+        cfg=handle.cfg,
         segment=segment,
         funnel=funnel.lower(),
         mode=mode,
         date_from=date_from,
         date_to=date_to,
         tags=selected_tags,
+        tag_queries=tag_queries,
+        tag_index=handle.dataset.tag_index,
+        row_cache=get_row_cache(),
+        dataset_key=handle.dataset.key,
     )
 
 
-@st.cache_data(show_spinner=False)
-def load_df_cached(file_bytes: bytes, name: str) -> pd.DataFrame:
+@st.cache_resource
+def get_registry() -> DatasetRegistry:
+    # Shared by all sessions: the same upload is parsed and prepared once per process
+    budget_mb = get_cfg().get("registry", {}).get("memory_budget_mb", 1024)
+    registry = DatasetRegistry(budget_bytes=int(budget_mb) * 1024 * 1024)
+    # Cached tag rows and retained job results share the budget (only uploads can be evicted)
+    registry.track("tag_rows", get_row_cache().nbytes)
+    registry.track("jobs", get_scheduler().results_nbytes)
+    return registry
+
+
+def read_upload(file_bytes: bytes, name: str) -> pd.DataFrame:
     import io
     bio = io.BytesIO(file_bytes)
     if name.endswith(".csv"):
         try:
-            return pd.read_csv(bio, sep=",", dtype=str, engine="pyarrow")
+            df = pd.read_csv(bio, sep=",", dtype=str, engine="pyarrow")
         except Exception:
             bio.seek(0)
-            return pd.read_csv(bio, sep=",", dtype=str)
+            df = pd.read_csv(bio, sep=",", dtype=str)
     else:
-        return pd.read_excel(bio, dtype=str)
+        df = pd.read_excel(bio, dtype=str)
+    return prepare_dataset(df)
 
 
-@st.cache_data(show_spinner=False)
-def extract_tag_options_cached(df: pd.DataFrame) -> list[str]:
+def load_dataset(file_bytes: bytes, name: str) -> Dataset:
+    return get_registry().get_or_load(file_bytes, name, read_upload)
+
+
+@st.cache_data(show_spinner=False, hash_funcs=HANDLE_HASH_FUNCS)
+def extract_tag_options_cached(handle: DatasetHandle) -> list[str]:
+    df = handle.dataset.df
     if "Теги сделки" not in df.columns:
         return []
+    if handle.dataset.tag_index is not None:
+        # Every spelling seen while indexing, i.e. the same set parse_tags yields below
+        return sorted(handle.dataset.tag_index.variants)
     tag_series = df["Теги сделки"].dropna().astype(str).apply(parse_tags)
     tags = sorted({t for sub in tag_series for t in sub})
     return tags
 
+
+@st.cache_resource(max_entries=32)
+def load_tag_groups(group_key: str, _group_bytes: bytes) -> CompiledGroups:
+    # Parsed once per file content; `group_key` is the sha256 of the bytes
+    return compile_tag_groups(_group_bytes)
+
+
+def group_reports_job(handle: DatasetHandle, segment, funnel, mode, date_from, date_to, groups: CompiledGroups, selected_tags: list[str]):
+    row_cache = get_row_cache()
+    dataset, cfg = handle.dataset, handle.cfg
+
+    def run(job: Job):
+        # Step 1: one aggregation over the union of all group tags; then each group slices
+        # its rows. Group order and tag order come from the file; selected tags are
+        # appended to every group.
+        if job.cancel_requested:
+            return
+        reports = compute_group_reports(
+            df_in=dataset.df,
+            cfg=cfg,
+            segment=segment,
+            funnel=funnel.lower(),
+            mode=mode,
+            date_from=date_from,
+            date_to=date_to,
+            groups=groups,
+            extra_tags=selected_tags,
+            tag_index=dataset.tag_index,
+            row_cache=row_cache,
+            dataset_key=dataset.key,
+            on_rows=job.step,
+        )
+        for item in reports:
+            if job.cancel_requested:
+                return
+            yield item
+    return run
+
+
+def export_job(spreadsheet_id: str, creds_dict: dict, base_name: str, report_df: pd.DataFrame, contacts_df: pd.DataFrame):
+    def run(job: Job):
+        export_two_tabs(
+            spreadsheet_id=spreadsheet_id,
+            creds_dict=creds_dict,
+            base_name=base_name,
+            report_df=report_df,
+            contacts_df=contacts_df,
+        )
+        yield base_name
+    return run
+
+
+CONTACTS_PAGE_SIZE = 500
+
+
+def contacts_view(reply_contacts_by_tag: dict, key: str, empty_text: str):
+    """One paginated table of reply contacts for all tags, with a tag filter.
+
+    Only the current page is sent to the browser, so the cost does not grow
+    with the number of tags or contacts.
+    """
+    contacts_df = contacts_frame(reply_contacts_by_tag)
+    if contacts_df.empty:
+        st.write(empty_text)
+        return
+    col_filter, col_page = st.columns([4, 1])
+    with col_filter:
+        chosen = st.multiselect("Фильтр по тегам", options=[t for t, c in reply_contacts_by_tag.items() if c], key=f"{key}_tags")
+    view = contacts_df[contacts_df["Тег"].isin(chosen)] if chosen else contacts_df
+    pages = max(1, math.ceil(len(view) / CONTACTS_PAGE_SIZE))
+    with col_page:
+        # The page count is part of the key, so changing the filter starts from page 1
+        page = int(st.number_input("Страница", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page_{pages}"))
+    start = (page - 1) * CONTACTS_PAGE_SIZE
+    st.dataframe(view.iloc[start:start + CONTACTS_PAGE_SIZE], use_container_width=True, hide_index=True)
+    st.caption(f"Контактов: {len(view)} • страница {page} из {pages}")
+
+
+def render_group_result(name: str, res: dict, key: str):
+    st.subheader(f"Группа: {name}")
+    if res["table_df"].empty:
+        st.write("— нет данных —")
+    else:
+        st.dataframe(res["table_df"], use_container_width=True)
+    st.markdown("Списки контактов с откликом")
+    contacts_view(res["reply_contacts_by_tag"], key=key, empty_text="— нет контактов —")
+
+
+def session_id() -> str:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else ""
+
+
+def _panel_state(state_key: str):
+    """The job stored under `state_key` and this session's detached marker for it."""
+    job = get_scheduler().get(st.session_state.get(state_key))
+    # (job id, results shown) once this session cancelled; the job may go on for other sessions
+    detached = st.session_state.get(f"{state_key}_detached")
+    if job is None or detached is None or detached[0] != job.id:
+        detached = None
+    return job, detached
+
+
+def attach_job(state_key: str, job: Job) -> None:
+    """Show `job` in the panel under `state_key`; a resubmit re-attaches after a cancel."""
+    st.session_state[state_key] = job.id
+    st.session_state.pop(f"{state_key}_detached", None)
+
+
+def job_panel(state_key: str, render_item, progress_text: str):
+    """Show progress and streamed results of the job stored under `state_key`.
+
+    `render_item(item, key)` gets a widget key unique to the job and item
+    position (group names in a file may repeat).
+
+    Runs as a fragment polling once a second while the job is in flight, so
+    the rest of the page stays interactive and the job survives reruns.
+    """
+    def _body():
+        # Streamlit keeps the first function registered for a fragment for the
+        # whole session and reruns that one, so the job is looked up on every run
+        job, detached = _panel_state(state_key)
+        if job is None:
+            return
+        if detached is not None:
+            for i, item in enumerate(list(job.results)[: detached[1]]):
+                render_item(item, f"{state_key}_{job.id}_{i}")
+            st.warning("Задача отменена.")
+            return
+        if not job.finished:
+            st.progress(job.progress, text=f"{progress_text}: {job.done}/{job.total}")
+            if st.button("Отменить", key=f"{state_key}_cancel"):
+                get_scheduler().cancel(job.id, subscriber=session_id())
+                st.session_state[f"{state_key}_detached"] = (job.id, len(job.results))
+                st.session_state[f"{state_key}_polling"] = False
+                st.rerun()
+        for i, item in enumerate(list(job.results)):
+            render_item(item, f"{state_key}_{job.id}_{i}")
+        if job.status == FAILED:
+            st.error(f"Ошибка: {job.error}")
+        elif job.status == CANCELLED:
+            st.warning("Задача отменена.")
+        if job.finished and st.session_state.get(f"{state_key}_polling"):
+            # Stop polling: a full rerun redraws the panel without run_every
+            st.session_state[f"{state_key}_polling"] = False
+            st.rerun()
+
+    job, detached = _panel_state(state_key)
+    if job is None:
+        return
+    running = not job.finished and detached is None
+    st.session_state[f"{state_key}_polling"] = running
+    st.fragment(run_every=1.0 if running else None)(_body)()
+
 cfg = get_cfg()
+start_metrics()
 
 segment = st.selectbox("Сегмент", ["RUS", "ENG", "ESP"])
 mode_map = {"Брошенная корзина": "basket", "Автосообщение": "auto", "Через менеджера": "manager"}
@@ -99,7 +316,18 @@ df = None
 tags = []
 if df_file:
     file_bytes = df_file.getvalue()
-    df = load_df_cached(file_bytes, df_file.name)
+    dataset = load_dataset(file_bytes, df_file.name)
+    handle = DatasetHandle.of(dataset, cfg)
+    df = dataset.df
+    usage = get_registry().usage()
+    tracked = usage["tracked_bytes"]
+    st.caption(
+        f"Память процесса (учтённая): {usage['used_bytes'] / 2**20:.1f} / {usage['budget_bytes'] / 2**20:.0f} МБ"
+        f" • выгрузки: {usage['datasets_bytes'] / 2**20:.1f} МБ ({usage['datasets']} шт.)"
+        f" • кэш строк: {tracked.get('tag_rows', 0) / 2**20:.1f} МБ"
+        f" • результаты задач: {tracked.get('jobs', 0) / 2**20:.1f} МБ",
+        help="Не учитываются копии, которые ещё держат сессии и st.cache_data после вытеснения выгрузки.",
+    )
 
     with st.expander("Общий кэш тегов (Google Sheets)", expanded=False):
         col_gs1, col_gs2 = st.columns(2)
@@ -137,7 +365,8 @@ if df_file:
         try:
             import json
             creds_dict_tags = json.loads(creds_json_tags)
-            cached_tags, meta = load_tags_cache_gs(tags_spreadsheet_id, creds_dict_tags, key=cache_key)
+            # Runs on every rerun: one try per call, a quota error falls back to the local cache
+            cached_tags, meta = load_tags_cache_gs(tags_spreadsheet_id, creds_dict_tags, key=cache_key, attempts=1)
             if cached_tags:
                 tags = cached_tags
                 used_source = f"GS (обновлено: {meta.get('updated_at', '—')})"
@@ -149,7 +378,7 @@ if df_file:
             tags = cached_tags
             used_source = f"Локально (обновлено: {meta.get('updated_at', '—')})"
     if not tags:
-        tags = extract_tag_options_cached(df)
+        tags = extract_tag_options_cached(handle)
         used_source = "Из файла"
     if used_source:
         st.caption(f"Источник тегов: {used_source}")
@@ -161,11 +390,17 @@ with col_tags:
         options=tags,
         help="Начните вводить тег, чтобы отфильтровать список. Если не выберете — будут все теги из файла."
     )
+    tag_queries_text = st.text_area(
+        "Сегменты по тегам (по одному на строку)",
+        help='Комбинации тегов: AND / OR / NOT и скобки, например: paid AND congress AND NOT fail. Теги с пробелами — в кавычках.',
+        height=68,
+    )
+    tag_queries = [q.strip() for q in tag_queries_text.splitlines() if q.strip()]
 with col_btn:
     st.write("")
     st.write("")
     if df_file and st.button("Обновить теги"):
-        fresh_tags = extract_tag_options_cached(df)
+        fresh_tags = extract_tag_options_cached(handle)
         # Save to Google Sheets if configured; else local JSON
         saved_ok = False
         if tags_spreadsheet_id and creds_json_tags:
@@ -185,82 +420,71 @@ with col_btn:
 export_area = st.empty()
 
 report_res = None
+# The stored report is only valid for the upload and inputs it was built from
+report_params = (handle.token, segment, funnel, mode, date_from, date_to, tuple(selected_tags), tuple(tag_queries)) if df_file else None
+if st.session_state.get("report_params") != report_params:
+    st.session_state.pop("report_res", None)
+    st.session_state.pop("report_params", None)
+
 if df_file and st.button("Сформировать отчёт"):
     try:
-        res = compute_cached(df, cfg, segment, funnel, mode, date_from, date_to, selected_tags)
-        report_res = res
+        report_res = compute_cached(handle, segment, funnel, mode, date_from, date_to, selected_tags, tag_queries)
+        # Keep the last report so reruns (contacts filter, export button) can still show and use it
+        st.session_state["report_res"] = report_res
+        st.session_state["report_params"] = report_params
+        st.session_state.pop("report_contacts_tags", None)
+    except Exception as e:
+        st.error(str(e))
 
-        st.subheader(f"{res['header']['Название']} — {res['header']['Период']}")
-        if res['header']['Отданы в ОП']:
-            st.caption(f"Отданы в ОП: {res['header']['Отданы в ОП']} • Дней от начала: {res['header']['Дней от начала']}")
+if df_file and st.session_state.get("report_res") is not None:
+    res = st.session_state["report_res"]
+    st.subheader(f"{res['header']['Название']} — {res['header']['Период']}")
+    if res['header']['Отданы в ОП']:
+        st.caption(f"Отданы в ОП: {res['header']['Отданы в ОП']} • Дней от начала: {res['header']['Дней от начала']}")
 
-        if res["table_df"].empty:
-            st.warning("По выбранным условиям данных не найдено.")
-        else:
-            st.markdown("### Итоговая таблица (по тегам)")
-            st.dataframe(res["table_df"], use_container_width=True)
+    if res["table_df"].empty:
+        st.warning("По выбранным условиям данных не найдено.")
+    else:
+        st.markdown("### Итоговая таблица (по тегам)")
+        st.dataframe(res["table_df"], use_container_width=True)
 
-        st.markdown("### Списки контактов с откликом (по тегам)")
-        if not res["reply_contacts_by_tag"]:
-            st.write("— нет контактов с откликом —")
-        else:
-            for tag, contacts in res["reply_contacts_by_tag"].items():
-                st.markdown(f"**{tag}**")
-                # contacts can be list of dicts with optional ID
-                if contacts and isinstance(contacts[0], dict):
-                    df_contacts = pd.DataFrame(contacts)
-                else:
-                    df_contacts = pd.DataFrame({"Основной контакт": contacts})
-                st.write(df_contacts)
-    except Exception as e:
-        st.error(str(e))
+    st.markdown("### Списки контактов с откликом (по тегам)")
+    contacts_view(res["reply_contacts_by_tag"], key="report_contacts", empty_text="— нет контактов с откликом —")
+
+group_bytes = group_file.getvalue() if df_file and group_file else None
+group_key = hashlib.sha256(group_bytes).hexdigest() if group_bytes is not None else None
+# Group results, like the single report, are only shown for the inputs they were built from
+group_params = (handle.token, group_key, segment, funnel, mode, date_from, date_to, tuple(selected_tags)) if group_key else None
+if st.session_state.get("group_params") != group_params:
+    for k in ("group_job_id", "group_job_id_detached", "group_params"):
+        st.session_state.pop(k, None)
 
 if df_file and group_file and st.button("Сформировать отчёты по группам"):
     try:
-        groups = parse_tag_groups_excel(group_file.getvalue())
-        if not groups:
+        groups = load_tag_groups(group_key, group_bytes)
+        if not groups.groups:
             st.warning("Группы не найдены в файле.")
         else:
-            for tg in groups:
-                # Preserve order from file; append additional selected tags keeping their order
-                union_tags = tg.tags + [t for t in (selected_tags or []) if t not in tg.tags]
-                # Build description map for the group's tags (normalized)
-                desc_map = {t.strip().lower(): (tg.desc_by_norm.get(t.strip().lower(), "") if hasattr(tg, 'desc_by_norm') else "") for t in tg.tags}
-                # Compute with description mapping (cache key unaffected, safe to pass at runtime)
-                res = compute_report_by_tags(
-                    df_in=df,
-                    cfg=cfg,
-                    segment=segment,
-                    funnel=funnel.lower(),
-                    mode=mode,
-                    date_from=date_from,
-                    date_to=date_to,
-                    tags=union_tags,
-                    tag_desc_by_norm=desc_map,
-                )
-                st.subheader(f"Группа: {tg.name}")
-                if res["table_df"].empty:
-                    st.write("— нет данных —")
-                else:
-                    st.dataframe(res["table_df"], use_container_width=True)
-                st.markdown("Списки контактов с откликом")
-                if not res["reply_contacts_by_tag"]:
-                    st.write("— нет контактов —")
-                else:
-                    for tag, contacts in res["reply_contacts_by_tag"].items():
-                        st.markdown(f"**{tag}**")
-                        if contacts and isinstance(contacts[0], dict):
-                            df_contacts = pd.DataFrame(contacts)
-                        else:
-                            df_contacts = pd.DataFrame({"Основной контакт": contacts})
-                        st.write(df_contacts)
+            job = get_scheduler().submit(
+                key=job_key("groups", *handle.token, groups.key, segment, funnel, mode, date_from, date_to, selected_tags),
+                fn=group_reports_job(handle, segment, funnel, mode, date_from, date_to, groups, selected_tags),
+                total=len(groups.groups) + 1,
+                label="Отчёты по группам",
+                subscriber=session_id(),
+            )
+            attach_job("group_job_id", job)
+            st.session_state["group_params"] = group_params
     except Exception as ex:
         st.error(f"Ошибка обработки групп: {ex}")
 
+if df_file and group_file:
+    job_panel("group_job_id", lambda item, key: render_group_result(*item, key=key), "Группы")
+
 st.divider()
 st.caption("Примечание: режимы 'Автосообщение' и 'Через менеджера' не используют фильтр по датам; 'Брошенная корзина' использует.")
 
 # Export to Google Sheets
+report_res = report_res if report_res is not None else st.session_state.get("report_res")
 if report_res is not None:
     st.markdown("### Экспорт в Google Sheets")
     with st.expander("Настройки экспорта", expanded=False):
@@ -275,23 +499,24 @@ if report_res is not None:
             creds_dict = json.loads(creds_json)
             report_df = report_res["table_df"]
             # Prepare contacts df (include ID if present)
-            contacts_rows = []
-            for tag, contacts in report_res["reply_contacts_by_tag"].items():
-                for c in contacts:
-                    if isinstance(c, dict):
-                        row = {"Тег": tag, **c}
-                    else:
-                        row = {"Тег": tag, "Основной контакт": c}
-                    contacts_rows.append(row)
-            contacts_df = pd.DataFrame(contacts_rows)
-
-            export_two_tabs(
-                spreadsheet_id=spreadsheet_id,
-                creds_dict=creds_dict,
-                base_name=base_name,
-                report_df=report_df,
-                contacts_df=contacts_df,
+            contacts_df = contacts_frame(report_res["reply_contacts_by_tag"])
+
+            # Exports write to the sheet: only an in-flight identical export (same account) is shared
+            job = get_scheduler().submit(
+                key=job_key("export", creds_dict.get("client_email"), spreadsheet_id, base_name,
+                            report_df.to_csv(index=False), contacts_df.to_csv(index=False)),
+                fn=export_job(spreadsheet_id, creds_dict, base_name, report_df, contacts_df),
+                total=1,
+                label="Экспорт в Google Sheets",
+                subscriber=session_id(),
+                reuse_finished=False,
             )
-            st.success("Экспорт завершён.")
+            attach_job("export_job_id", job)
         except Exception as ex:
             st.error(f"Ошибка экспорта: {ex}")
+    job_panel("export_job_id", lambda item, key: st.success("Экспорт завершён."), "Экспорт")
+
+# Admin view of the same metrics: open the app with ?metrics=1
+if st.query_params.get("metrics"):
+    with st.expander("Метрики (Prometheus)", expanded=True):
+        st.code(METRICS.render(), language="text")
@@ -0,0 +1,92 @@
+"""Time the pandas and polars report backends on a synthetic AmoCRM export.
+
+    python -m benchmarks.bench_backends --rows 200000 --tags 300
+
+The export mixes date layouts (dd.mm.yyyy, dd/mm/yyyy, dd.mm.yy) and leaves
+some IDs empty; the cases cover raw and prepared frames, basket dates and a
+missing ID column. Result equivalence is checked by tests/test_backends.py.
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import random
+import sys
+import time
+
+import pandas as pd
+
+from amo_report import compute_report_by_tags, load_config
+from amo_report.report import _polars_backend, prepare_dataset
+
+_STAGES = [
+    "контакт 1", "аванс", "успешно реализовано", "уже купил", "закрыто и не реализовано",
+    "лид не распределен", "no wazzap", "успешно", "не купил",
+]
+
+
+def _export(n_rows: int, n_tags: int, seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    tags = [f"tag_{i}" for i in range(n_tags)] + ["Ёлка", "*congress*"]
+    rows = []
+    for i in range(n_rows):
+        picked = rng.sample(tags, rng.randint(0, 4))
+        picked = [t.upper() if rng.random() < 0.2 else t for t in picked]
+        day, month = rng.randint(1, 28), rng.randint(1, 12)
+        rows.append({
+            "ID": str(100000 + i) if rng.random() < 0.95 else None,
+            "Этап сделки": rng.choice(_STAGES),
+            "Воронка": rng.choice(["Корзина", "CRM RU", "CRM ENG"]),
+            "Теги сделки": rng.choice([", ", "; ", "|"]).join(picked) or None,
+            "Бюджет": rng.choice(["1 000,50", "200", "", "€30"]),
+            "Дата создания": rng.choice([
+                f"{day:02d}.{month:02d}.2025 10:00", f"{day:02d}/{month:02d}/2025 10:00", f"{day:02d}.{month:02d}.25",
+            ]),
+            "Основной контакт": f"Контакт {rng.randint(0, n_rows // 3)}" if rng.random() < 0.9 else None,
+        })
+    return pd.DataFrame(rows)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - start
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=200000)
+    ap.add_argument("--tags", type=int, default=300)
+    ap.add_argument("--config", default="config.yaml")
+    args = ap.parse_args()
+
+    cfg = load_config(args.config)
+    cfg_pd = copy.deepcopy(cfg)
+    cfg_pd["compute"] = {"backend": "pandas"}
+    cfg_pl = copy.deepcopy(cfg)
+    cfg_pl["compute"] = {"backend": "polars"}
+    if _polars_backend(cfg_pl) is None:
+        sys.exit("polars is not installed")
+
+    raw = _export(args.rows, args.tags)
+    prepared = prepare_dataset(raw)
+    no_id = raw.drop(columns=["ID"])
+    basket = ("RUS", "Корзина", "basket", pd.Timestamp("2025-03-01").date(), pd.Timestamp("2025-09-30").date(), [], None)
+    cases = [
+        ("crm, all tags", raw, ("RUS", "CRM RU", "auto", None, None, [], None)),
+        ("crm, prepared", prepared, ("RUS", "CRM RU", "auto", None, None, [], None)),
+        ("basket, raw", raw, basket),
+        ("basket, prepared", prepared, basket),
+        ("basket, no ID", no_id, basket),
+        ("chosen + queries", prepared, ("RUS", "CRM RU", "auto", None, None, ["tag_1", "Ёлка"], ["tag_2 AND NOT tag_3", "tag_4 OR tag_5"])),
+    ]
+
+    print(f"rows={len(raw)} tags={args.tags}")
+    for name, df, (segment, funnel, mode, d_from, d_to, tags, queries) in cases:
+        _, t_pd = _timed(lambda: compute_report_by_tags(df, cfg_pd, segment, funnel, mode, d_from, d_to, tags, tag_queries=queries))
+        _, t_pl = _timed(lambda: compute_report_by_tags(df, cfg_pl, segment, funnel, mode, d_from, d_to, tags, tag_queries=queries))
+        print(f"{name:<18} pandas {t_pd * 1000:8.1f} ms  polars {t_pl * 1000:8.1f} ms  x{t_pd / t_pl:4.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Import-time guard for the modules app.py loads on every cold start.
+
+    python -m benchmarks.bench_import --runs 5 --budget-ms 1000
+
+Runs `python -X importtime` in fresh interpreters, prints the median cost of
+importing the app's amo_report modules and the heaviest packages behind it,
+and exits non-zero if the budget is exceeded or an optional dependency
+(gspread, oauth2client, openpyxl, ...) is imported eagerly.
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# What app.py imports from the package at startup
+APP_IMPORTS = [
+    "amo_report.config",
+    "amo_report.report",
+    "amo_report.utils",
+    "amo_report.sheets",
+    "amo_report.tags_cache",
+    "amo_report.tag_groups",
+    "amo_report.jobs",
+    "amo_report.registry",
+    "amo_report.metrics",
+]
+
+# Must only load when an export / Excel upload actually happens
+LAZY_ONLY = ["gspread", "oauth2client", "google.auth", "googleapiclient", "openpyxl", "requests"]
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)\s*$")
+
+
+def _importtime(code: str) -> list[tuple[int, int, int, str]]:
+    """(self_us, cumulative_us, depth, module) for every import in a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    out = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            out.append((int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2, m.group(4)))
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--budget-ms", type=float, default=1000.0, help="median import budget for APP_IMPORTS")
+    ap.add_argument("--top", type=int, default=10, help="heaviest packages to list")
+    args = ap.parse_args()
+
+    startup = {name for _, _, _, name in _importtime("pass")}
+    code = "; ".join(f"import {m}" for m in APP_IMPORTS)
+
+    totals = []
+    by_package: dict[str, list[int]] = defaultdict(list)
+    eager: set[str] = set()
+    for _ in range(args.runs):
+        records = _importtime(code)
+        totals.append(sum(cum for _, cum, depth, name in records if depth == 1 and name not in startup))
+        per_pkg: dict[str, int] = defaultdict(int)
+        for self_us, _, _, name in records:
+            if name not in startup:
+                per_pkg[name.split(".")[0]] += self_us
+            if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_ONLY):
+                eager.add(name.split(".")[0])
+        for pkg, us in per_pkg.items():
+            by_package[pkg].append(us)
+
+    median_ms = statistics.median(totals) / 1000
+    print(f"amo_report app imports: median {median_ms:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    heaviest = sorted(by_package.items(), key=lambda kv: -statistics.median(kv[1]))[: args.top]
+    for pkg, samples in heaviest:
+        print(f"  {pkg:<24} {statistics.median(samples) / 1000:8.1f} ms")
+
+    failed = False
+    if eager:
+        print(f"FAIL: optional dependencies imported eagerly: {', '.join(sorted(eager))}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"FAIL: import budget exceeded by {median_ms - args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Time the Google Sheets export/tags-cache paths against the offline emulator.
+
+    python -m benchmarks.bench_sheets --latency 0.15 --inject-429 1
+
+Reports wall time and API round-trips per operation at realistic sizes.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from amo_report import sheets
+from amo_report.sheets import export_group_result, export_two_tabs
+from amo_report.sheets_emulator import SheetsEmulator
+from amo_report.tags_cache import load_tags_cache_gs, save_tags_cache_gs
+
+
+def _report_df(n_tags: int) -> pd.DataFrame:
+    rng = random.Random(0)
+    rows = []
+    for i in range(n_tags):
+        cnt = rng.randint(50, 500)
+        rows.append({
+            "Тег сделки": f"tag_{i}",
+            "Описание": "",
+            "Кол-во": cnt,
+            "Обработано": cnt - 5,
+            "% обработано": "99%",
+            "Контакт": cnt // 2,
+            "% контакт": "50%",
+            "Игнор": cnt // 2 - 5,
+            "% игнор": "49%",
+            "Отклик (Покупка)": cnt // 5,
+            "Оборот, €": round(rng.uniform(0, 20000), 2),
+            "CR, %": "40%",
+            "Конверсия в покупку, %": "20%",
+        })
+    return pd.DataFrame(rows)
+
+
+def _contacts_df(n_rows: int, n_tags: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Тег": [f"tag_{i % n_tags}" for i in range(n_rows)],
+        "Основной контакт": [f"Контакт {i}" for i in range(n_rows)],
+        "ID": [str(100000 + i) for i in range(n_rows)],
+    })
+
+
+def _run(name: str, emu: SheetsEmulator, fn) -> None:
+    emu.reset_counters()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    calls = ", ".join(f"{m}={n}" for m, n in sorted(emu.calls.items()))
+    errors = sum(emu.errors.values())
+    print(f"{name:<22} {elapsed * 1000:9.1f} ms  round-trips={sum(emu.calls.values()):<3} errors={errors:<2} [{calls}]")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--latency", type=float, default=0.15, help="seconds per emulated API call")
+    ap.add_argument("--jitter", type=float, default=0.0)
+    ap.add_argument("--tags", type=int, default=300, help="report rows / tags")
+    ap.add_argument("--contacts", type=int, default=20000, help="contact rows")
+    ap.add_argument("--cache-tags", type=int, default=5000, help="tags in the tags cache")
+    ap.add_argument("--inject-429", type=int, default=0, help="429s injected before each operation")
+    ap.add_argument("--backoff", type=float, default=sheets.BACKOFF_SECONDS, help="first retry delay")
+    args = ap.parse_args()
+
+    sheets.BACKOFF_SECONDS = args.backoff
+    emu = SheetsEmulator(latency=args.latency, jitter=args.jitter, seed=0)
+    report_df = _report_df(args.tags)
+    contacts_df = _contacts_df(args.contacts, args.tags)
+    cache_tags = [f"tag_{i}" for i in range(args.cache_tags)]
+    sid = "bench-spreadsheet"
+
+    print(f"latency={args.latency}s report={report_df.shape} contacts={contacts_df.shape} cache_tags={len(cache_tags)}")
+    with emu.install():
+        ops = [
+            ("export_two_tabs", lambda: export_two_tabs(sid, {}, "RUS | bench", report_df, contacts_df)),
+            ("export_two_tabs (2nd)", lambda: export_two_tabs(sid, {}, "RUS | bench", report_df, contacts_df)),
+            ("export_group_result", lambda: export_group_result(sid, {}, "bench", report_df, contacts_df)),
+            ("save_tags_cache_gs", lambda: save_tags_cache_gs(cache_tags, sid, {}, key="bench")),
+            ("load_tags_cache_gs", lambda: load_tags_cache_gs(sid, {}, key="bench")),
+        ]
+        for name, fn in ops:
+            if args.inject_429:
+                emu.fail_next(status=429, times=args.inject_429)
+            _run(name, emu, fn)
+
+        loaded, meta = load_tags_cache_gs(sid, {}, key="bench")
+        assert loaded == sorted(cache_tags), "tags cache round-trip mismatch"
+
+
+if __name__ == "__main__":
+    main()
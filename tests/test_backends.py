@@ -0,0 +1,98 @@
+"""The polars report backend against the pandas one on a small synthetic export.
+
+    python -m unittest discover -s tests
+"""
+from __future__ import annotations
+
+import copy
+import importlib.util
+import random
+import unittest
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from amo_report import compute_report_by_tags, load_config
+from amo_report.report import prepare_dataset
+
+CONFIG = Path(__file__).resolve().parent.parent / "config.yaml"
+
+_STAGES = [
+    "контакт 1", "аванс", "успешно реализовано", "уже купил", "закрыто и не реализовано",
+    "лид не распределен", "no wazzap", "успешно", "не купил",
+]
+
+
+def _export(n_rows: int = 600, n_tags: int = 12, seed: int = 0) -> pd.DataFrame:
+    """Mixed date layouts, tag separators and case; some IDs, tags and contacts empty."""
+    rng = random.Random(seed)
+    tags = [f"tag_{i}" for i in range(n_tags)] + ["Ёлка", "*congress*"]
+    rows = []
+    for i in range(n_rows):
+        picked = rng.sample(tags, rng.randint(0, 4))
+        picked = [t.upper() if rng.random() < 0.2 else t for t in picked]
+        day, month = rng.randint(1, 28), rng.randint(1, 12)
+        rows.append({
+            "ID": str(100000 + i) if rng.random() < 0.9 else None,
+            "Этап сделки": rng.choice(_STAGES),
+            "Воронка": rng.choice(["Корзина", "CRM RU"]),
+            "Теги сделки": rng.choice([", ", "; ", "|"]).join(picked) or None,
+            "Бюджет": rng.choice(["1 000,50", "200", "", "€30"]),
+            "Дата создания": rng.choice([
+                f"{day:02d}.{month:02d}.2025 10:00", f"{day:02d}/{month:02d}/2025 10:00", f"{day:02d}.{month:02d}.25",
+            ]),
+            "Основной контакт": f"Контакт {rng.randint(0, n_rows // 3)}" if rng.random() < 0.9 else None,
+        })
+    return pd.DataFrame(rows)
+
+
+@unittest.skipUnless(importlib.util.find_spec("polars"), "polars is not installed")
+class PolarsBackendTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cfg = load_config(CONFIG)
+        cls.cfg_pd = copy.deepcopy(cfg)
+        cls.cfg_pd["compute"] = {"backend": "pandas"}
+        cls.cfg_pl = copy.deepcopy(cfg)
+        cls.cfg_pl["compute"] = {"backend": "polars"}
+        cls.raw = _export()
+        cls.prepared = prepare_dataset(cls.raw)
+
+    def assertSameReport(self, df, segment, funnel, mode, date_from=None, date_to=None, tags=(), queries=None):
+        args = (segment, funnel, mode, date_from, date_to, list(tags))
+        res_pd = compute_report_by_tags(df, self.cfg_pd, *args, tag_queries=queries)
+        res_pl = compute_report_by_tags(df, self.cfg_pl, *args, tag_queries=queries)
+        self.assertFalse(res_pd["table_df"].empty)
+        money = "Оборот, €"
+        pd.testing.assert_frame_equal(res_pd["table_df"].drop(columns=[money]), res_pl["table_df"].drop(columns=[money]))
+        pd.testing.assert_series_equal(
+            res_pd["table_df"][money].astype(float), res_pl["table_df"][money].astype(float), atol=0.01,
+        )
+        # repr keeps None and NaN IDs apart (and makes NaN equal to itself)
+        self.assertEqual(repr(res_pd["reply_contacts_by_tag"]), repr(res_pl["reply_contacts_by_tag"]))
+
+    def test_raw(self):
+        self.assertSameReport(self.raw, "RUS", "CRM RU", "auto")
+
+    def test_prepared(self):
+        self.assertSameReport(self.prepared, "RUS", "CRM RU", "auto")
+
+    def test_basket_dates_raw(self):
+        self.assertSameReport(self.raw, "RUS", "Корзина", "basket", date(2025, 3, 1), date(2025, 9, 30))
+
+    def test_basket_dates_prepared(self):
+        self.assertSameReport(self.prepared, "RUS", "Корзина", "basket", date(2025, 3, 1), date(2025, 9, 30))
+
+    def test_without_id_column(self):
+        self.assertSameReport(self.raw.drop(columns=["ID"]), "RUS", "Корзина", "basket", date(2025, 3, 1), date(2025, 9, 30))
+
+    def test_chosen_tags_and_queries(self):
+        self.assertSameReport(
+            self.prepared, "RUS", "CRM RU", "auto",
+            tags=["tag_1", "Ёлка"], queries=["tag_2 AND NOT tag_3", "tag_4 OR tag_5"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
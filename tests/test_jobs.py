@@ -0,0 +1,67 @@
+"""JobScheduler status and subscriber handling.
+
+    python -m unittest discover -s tests
+"""
+from __future__ import annotations
+
+import threading
+import unittest
+
+from amo_report.jobs import CANCELLED, DONE, JobScheduler
+
+
+def _wait(job, timeout: float = 5.0) -> None:
+    for _ in range(int(timeout / 0.01)):
+        if job.finished:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError(f"job {job.id} did not finish: {job.status}")
+
+
+class JobStatusTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = JobScheduler(max_workers=1)
+
+    def test_finished_job_is_done(self):
+        job = self.scheduler.submit("k", lambda job: iter([1, 2]), total=2)
+        _wait(job)
+        self.assertEqual(job.status, DONE)
+        self.assertEqual(job.results, [1, 2])
+
+    def test_job_returning_on_cancel_is_cancelled(self):
+        started, release = threading.Event(), threading.Event()
+
+        def run(job):
+            # Like the group reports job: cancel is honoured by returning before any item
+            started.set()
+            release.wait(5)
+            if job.cancel_requested:
+                return
+            yield "never"
+
+        job = self.scheduler.submit("k", run, total=1, subscriber="a")
+        started.wait(5)
+        self.scheduler.cancel(job.id, subscriber="a")
+        release.set()
+        _wait(job)
+        self.assertEqual(job.status, CANCELLED)
+        self.assertEqual(job.results, [])
+
+    def test_cancel_only_detaches_while_others_wait(self):
+        release = threading.Event()
+
+        def run(job):
+            release.wait(5)
+            yield "item"
+
+        job = self.scheduler.submit("k", run, total=1, subscriber="a")
+        self.assertIs(self.scheduler.submit("k", run, total=1, subscriber="b"), job)
+        self.scheduler.cancel(job.id, subscriber="a")
+        self.assertFalse(job.cancel_requested)
+        release.set()
+        _wait(job)
+        self.assertEqual(job.status, DONE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""Google Sheets paths against the offline emulator (no network, no credentials).
+
+    python -m unittest discover -s tests
+"""
+from __future__ import annotations
+
+import unittest
+from unittest import mock
+
+import gspread
+import pandas as pd
+
+from amo_report import sheets
+from amo_report.metrics import SHEETS_RETRIES
+from amo_report.sheets import _call, export_two_tabs
+from amo_report.sheets_emulator import SheetsEmulator
+from amo_report.tags_cache import load_tags_cache_gs, save_tags_cache_gs
+
+
+class EmulatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.emu = SheetsEmulator(seed=0)
+        installed = self.emu.install()
+        installed.__enter__()
+        self.addCleanup(installed.__exit__, None, None, None)
+        # No real waiting between retries
+        sleep = mock.patch.object(sheets.time, "sleep")
+        self.sleeps = sleep.start()
+        self.addCleanup(sleep.stop)
+
+
+class CallRetryTest(EmulatorTestCase):
+    def test_retries_injected_429_and_500_with_backoff(self):
+        sh = self.emu.spreadsheet("s1")
+        self.emu.fail_next("worksheets", status=429)
+        self.emu.fail_next("worksheets", status=500)
+        retries_before = SHEETS_RETRIES.value(method="worksheets")
+
+        self.assertEqual(_call("worksheets", sh.worksheets), [])
+
+        self.assertEqual(self.emu.calls["worksheets"], 3)
+        self.assertEqual(SHEETS_RETRIES.value(method="worksheets") - retries_before, 2)
+        delays = [c.args[0] for c in self.sleeps.call_args_list]
+        self.assertEqual(delays, [sheets.BACKOFF_SECONDS, sheets.BACKOFF_SECONDS * 2])
+
+    def test_gives_up_after_max_attempts(self):
+        sh = self.emu.spreadsheet("s1")
+        self.emu.fail_next("worksheets", status=503, times=sheets.MAX_ATTEMPTS)
+        with self.assertRaises(gspread.exceptions.APIError):
+            _call("worksheets", sh.worksheets)
+        self.assertEqual(self.emu.calls["worksheets"], sheets.MAX_ATTEMPTS)
+
+    def test_client_errors_are_not_retried(self):
+        sh = self.emu.spreadsheet("s1")
+        self.emu.fail_next("worksheets", status=400)
+        with self.assertRaises(gspread.exceptions.APIError):
+            _call("worksheets", sh.worksheets)
+        self.assertEqual(self.emu.calls["worksheets"], 1)
+        self.sleeps.assert_not_called()
+
+    def test_attempts_cap_per_call(self):
+        sh = self.emu.spreadsheet("s1")
+        self.emu.fail_next("worksheets", status=429)
+        with self.assertRaises(gspread.exceptions.APIError):
+            _call("worksheets", sh.worksheets, _attempts=1)
+        self.assertEqual(self.emu.calls["worksheets"], 1)
+        self.sleeps.assert_not_called()
+
+    def test_add_worksheet_is_not_retried_on_5xx(self):
+        self.emu.fail_next("add_worksheet", status=500)
+        with self.assertRaises(gspread.exceptions.APIError):
+            export_two_tabs("s1", {}, "base", pd.DataFrame({"a": [1]}), pd.DataFrame({"b": [2]}))
+        self.assertEqual(self.emu.calls["add_worksheet"], 1)
+
+
+class TagsCacheRoundTripTest(EmulatorTestCase):
+    def test_save_then_load(self):
+        tags = ["paid", "Ёлка", "paid", " ", "congress"]
+        save_tags_cache_gs(tags, "s1", {}, key="RUS")
+
+        loaded, meta = load_tags_cache_gs("s1", {}, key="RUS")
+
+        self.assertEqual(loaded, sorted({"paid", "Ёлка", "congress"}))
+        self.assertTrue(meta["updated_at"])
+        # Other keys are separate worksheets
+        self.assertEqual(load_tags_cache_gs("s1", {}, key="ENG")[0], [])
+
+    def test_single_attempt_load_gives_up_without_backoff(self):
+        save_tags_cache_gs(["a"], "s1", {})
+        self.emu.fail_next("get_all_values", status=429)
+
+        self.assertEqual(load_tags_cache_gs("s1", {}, attempts=1), ([], {"updated_at": None}))
+        self.assertEqual(self.emu.calls["get_all_values"], 1)
+        self.sleeps.assert_not_called()
+
+    def test_save_survives_injected_429(self):
+        self.emu.fail_next("update", status=429)
+        save_tags_cache_gs(["a", "b"], "s1", {})
+        self.assertEqual(load_tags_cache_gs("s1", {})[0], ["a", "b"])
+
+
+class ExportRoundTripsTest(EmulatorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.report_df = pd.DataFrame({"Тег сделки": ["paid", "fail"], "Кол-во": [3, 1]})
+        self.contacts_df = pd.DataFrame({"Тег": ["paid"], "Основной контакт": ["Иван"], "ID": [None]})
+
+    def test_first_export_creates_both_tabs(self):
+        export_two_tabs("s1", {}, "RUS", self.report_df, self.contacts_df)
+
+        self.assertEqual(
+            dict(self.emu.calls),
+            {"open_by_key": 1, "worksheet": 2, "add_worksheet": 2, "update": 2},
+        )
+        ws = self.emu.spreadsheet("s1")._worksheets["RUS | Отчёт"]
+        self.assertEqual(ws._values, [["Тег сделки", "Кол-во"], ["paid", "3"], ["fail", "1"]])
+        contacts = self.emu.spreadsheet("s1")._worksheets["RUS | Список_Отклик"]
+        self.assertEqual(contacts._values[1], ["paid", "Иван", ""])
+
+    def test_repeat_export_clears_existing_tabs(self):
+        export_two_tabs("s1", {}, "RUS", self.report_df, self.contacts_df)
+        self.emu.reset_counters()
+
+        export_two_tabs("s1", {}, "RUS", self.report_df.head(1), self.contacts_df)
+
+        self.assertEqual(dict(self.emu.calls), {"open_by_key": 1, "worksheet": 2, "clear": 2, "update": 2})
+        ws = self.emu.spreadsheet("s1")._worksheets["RUS | Отчёт"]
+        self.assertEqual(len(ws._values), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()